@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are not serialised across processes
+    fcntl = None
+
+import numpy as np
+
+import utils
+
+# Bump when the layout of any cached payload changes so stale files are rebuilt
+CACHE_VERSION = 1
+HASH_CHUNK = 1 << 20
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path, with_hash=True):
+    path = Path(path)
+    if not path.exists():
+        return {"path": path.name, "missing": True}
+    st = path.stat()
+    fp = {"path": path.name, "size": st.st_size, "mtime": st.st_mtime_ns}
+    if with_hash:
+        fp["sha256"] = _sha256(path)
+    return fp
+
+
+def _cache_paths(name, cache_dir):
+    cache_dir = Path(cache_dir or utils.CACHE_DIR)
+    return cache_dir / f"{name}.pkl", cache_dir / f"{name}.meta.json"
+
+
+def _sources_match(stored, sources):
+    # size + mtime is checked first; the hash is only recomputed when mtime moved
+    # (fresh checkout, copied image layer) so an unchanged file is never re-read.
+    if len(stored) != len(sources):
+        return False, False
+    refreshed = False
+    for old, path in zip(stored, sources):
+        cur = file_fingerprint(path, with_hash=False)
+        if cur["path"] != old.get("path") or cur.get("missing") != old.get("missing"):
+            return False, False
+        if cur.get("missing"):
+            continue
+        if cur["size"] != old["size"]:
+            return False, False
+        if cur["mtime"] != old["mtime"]:
+            if _sha256(path) != old["sha256"]:
+                return False, False
+            refreshed = True
+    return True, refreshed
+
+
+def write_atomic(path, data):
+    # Per-thread temp name: request threads of one worker may write the same file
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def save_array(path, array):
+    # Written beside the target and renamed over it, so a reader that memory-mapped the
+    # previous file (a live engine during a hot reload) keeps its inode instead of
+    # faulting on a truncated mapping
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, array, allow_pickle=False)
+    os.replace(tmp, path)
+
+
+def _write_meta(meta_path, name, sources):
+    meta = {
+        "name": name,
+        "version": CACHE_VERSION,
+        "sources": [file_fingerprint(p) for p in sources],
+    }
+    write_atomic(meta_path, json.dumps(meta, indent=2).encode("utf-8"))
+
+
+def meta_is_current(name, sources, cache_dir=None):
+    _, meta_path = _cache_paths(name, cache_dir)
+    if not meta_path.exists():
+        return False
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta.get("version") != CACHE_VERSION:
+            return False
+        ok, refreshed = _sources_match(meta.get("sources", []), sources)
+        if ok and refreshed:
+            _write_meta(meta_path, name, sources)
+        return ok
+    except Exception as e:
+        print(f"⚠️ Cache metadata unreadable for {name}: {e}")
+        return False
+
+
+@contextmanager
+def build_lock(name, cache_dir=None):
+    # Cross-process lock around checking and (re)building one cache entry: under gunicorn
+    # the first worker builds while the others wait, then load what it wrote
+    path = Path(cache_dir or utils.CACHE_DIR) / f"{name}.lock"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def entry_dir(name, cache_dir=None):
+    # Directory for payloads stored as several files (e.g. memory-mappable .npy arrays)
+    return Path(cache_dir or utils.CACHE_DIR) / name
+
+
+def invalidate(name, cache_dir=None):
+    _, meta_path = _cache_paths(name, cache_dir)
+    meta_path.unlink(missing_ok=True)
+
+
+def write_meta(name, sources, cache_dir=None):
+    _, meta_path = _cache_paths(name, cache_dir)
+    meta_path.parent.mkdir(parents=True, exist_ok=True)
+    _write_meta(meta_path, name, sources)
+
+
+def load(name, sources, cache_dir=None):
+    data_path, _ = _cache_paths(name, cache_dir)
+    if not data_path.exists() or not meta_is_current(name, sources, cache_dir):
+        return None
+    try:
+        with open(data_path, "rb") as f:
+            return pickle.load(f)
+    except Exception as e:
+        print(f"⚠️ Cache read failed for {name}: {e}")
+        return None
+
+
+def save(name, sources, payload, cache_dir=None):
+    data_path, meta_path = _cache_paths(name, cache_dir)
+    try:
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        write_atomic(data_path, pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL))
+        # Meta goes last: a crash between the two writes leaves a cache that fails validation
+        _write_meta(meta_path, name, sources)
+    except Exception as e:
+        print(f"⚠️ Cache write failed for {name}: {e}")
+
+
+def cached(name, sources, builder, cache_dir=None, rebuild=False):
+    payload = None if rebuild else load(name, sources, cache_dir)
+    if payload is not None:
+        print(f"⚡ Loaded {name} from cache")
+        return payload
+    payload = builder()
+    save(name, sources, payload, cache_dir)
+    return payload
@@ -1,50 +1,96 @@
 import numpy as np
 import joblib
+import multiprocessing as mp
+import os
+import resource
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import compact_models
+from threadpoolctl import threadpool_limits
 from sklearn.neural_network import MLPClassifier
 from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedKFold
 from sklearn.preprocessing import RobustScaler
+from data_processing import MODEL_FEATURES
 from sklearn.metrics import (
     accuracy_score, precision_score, recall_score, 
-    f1_score, precision_recall_curve, classification_report
+    f1_score, precision_recall_curve, classification_report,
+    average_precision_score
 )
 
-def train_hyper_optimized_model(df_agg, model_dir):
+# Hyperparameters that change the fitted models; main.py can override them per run
+DEFAULT_PARAMS = {
+    "mlp": {
+        "hidden_layer_sizes": (256, 128, 64),
+        "activation": 'relu',
+        "solver": 'adam',
+        "alpha": 0.001,
+        "learning_rate": 'adaptive',
+        "max_iter": 500,
+        "random_state": 42,
+    },
+    "rf": {
+        "n_estimators": 500,
+        "criterion": 'entropy',
+        "max_features": 'log2',
+        "class_weight": 'balanced_subsample',
+        "random_state": 42,
+    },
+    "target_precision": 0.90,
+    # "in_sample" fits the RF and tunes the threshold on in-sample MLP probabilities;
+    # "oof" stacks on out-of-fold probabilities (see train_oof_stacked_model)
+    "training": "in_sample",
+    "oof": {
+        "folds": 5,
+        "mlp_alphas": [0.001],
+        "rf_sizes": [100, 250, 500],
+        "validation_fraction": 0.1,
+        "n_iter_no_change": 10,
+    },
+}
+
+def resolve_params(overrides=None):
+    params = {key: dict(value) if isinstance(value, dict) else value for key, value in DEFAULT_PARAMS.items()}
+    for key, value in (overrides or {}).items():
+        if isinstance(params.get(key), dict):
+            params[key].update(value)
+        else:
+            params[key] = value
+    return params
+
+def train_hyper_optimized_model(df_agg, model_dir, params=None, cpus=None, memory_mb=None):
+    params = resolve_params(params)
+    if params["training"] == "oof":
+        return train_oof_stacked_model(df_agg, model_dir, params, cpus=cpus, memory_mb=memory_mb)
+    if params["training"] != "in_sample":
+        raise ValueError(f"Unknown training mode: {params['training']}")
+
     print("🤖 Step 3: Training Hyper-Optimized AI Ensemble...")
-    features = ['ppi_mean', 'ppi_max', 'ppi_std', 'ppi_skew', 'interaction_count', 'degree_max', 'degree_mean']
-    X = df_agg[features].values
+    X = df_agg[MODEL_FEATURES].values
     y = df_agg['is_target'].values
     
     scaler = RobustScaler()
     X_scaled = scaler.fit_transform(X)
     
     # MLP: Deep 3-layer architecture
-    mlp = MLPClassifier(
-        hidden_layer_sizes=(256, 128, 64), 
-        activation='relu', 
-        solver='adam', 
-        alpha=0.001, 
-        learning_rate='adaptive', 
-        max_iter=500, 
-        random_state=42
-    ).fit(X_scaled, y)
+    mlp = MLPClassifier(**params["mlp"]).fit(X_scaled, y)
     
     mlp_probs = mlp.predict_proba(X_scaled)[:, 1].reshape(-1, 1)
 
     # Random Forest: Entropy-based decision making
-    rf = RandomForestClassifier(
-        n_estimators=500, 
-        criterion='entropy', 
-        max_features='log2', 
-        class_weight='balanced_subsample', 
-        n_jobs=-1, 
-        random_state=42
-    ).fit(mlp_probs, y)
+    rf = RandomForestClassifier(n_jobs=cpus or -1, **params["rf"]).fit(mlp_probs, y)
 
     final_probs = rf.predict_proba(mlp_probs)[:, 1]
+    return _finish(scaler, mlp, rf, y, final_probs, params, model_dir)
 
+def _finish(scaler, mlp, rf, y, final_probs, params, model_dir):
     # Threshold Tuning for Maximum Precision (Targeting 90%)
+    target = params["target_precision"]
     precisions, recalls, thresholds = precision_recall_curve(y, final_probs)
-    opt_threshold = thresholds[np.where(precisions >= 0.90)[0][0]] if any(precisions >= 0.90) else 0.5
+    # The last precision (recall 0) has no threshold of its own
+    reached = np.where(precisions[:-1] >= target)[0]
+    opt_threshold = thresholds[reached[0]] if len(reached) else 0.5
 
     y_pred = (final_probs >= opt_threshold).astype(int)
 
@@ -67,5 +113,169 @@ def train_hyper_optimized_model(df_agg, model_dir):
     joblib.dump(rf, model_dir / "hyper_rf.pkl")
     joblib.dump(scaler, model_dir / "hyper_scaler.pkl")
     joblib.dump(opt_threshold, model_dir / "hyper_threshold.pkl")
+    # Serving reads the memory-mappable export, so refresh it alongside the pickles; a refused
+    # export only logs a warning and serving falls back to these pickles
+    compact_models.export_models(model_dir, models=(scaler, mlp, rf, opt_threshold))
     
-    return opt_threshold, final_probs
\ No newline at end of file
+    return opt_threshold, final_probs
+
+# --- Out-of-fold stacking ---------------------------------------------------------
+
+_thread_limits = None
+
+def _limit_threads(threads):
+    # Pool initializer: cap BLAS/OpenMP threads at this worker's share of the CPU budget
+    global _thread_limits
+    _thread_limits = threadpool_limits(limits=threads)
+
+def _reset_peak_rss():
+    # Linux lets a process reset its high-water mark, so each fold gets its own peak
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def _peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _measured(task, *args):
+    _reset_peak_rss()
+    start = time.perf_counter()
+    result = task(*args)
+    result["seconds"] = time.perf_counter() - start
+    result["peak_mb"] = _peak_rss_mb()
+    result["pid"] = os.getpid()
+    return result
+
+def _mlp_fold(X, y, train, test, mlp_params, alphas, keep_models=False):
+    scaler = RobustScaler().fit(X[train])
+    X_train = scaler.transform(X[train])
+    result = {"probs": {}, "n_iter": {}, "models": {}, "scaler": scaler if keep_models else None}
+    for alpha in alphas:
+        mlp = MLPClassifier(**{**mlp_params, "alpha": alpha}).fit(X_train, y[train])
+        result["n_iter"][alpha] = mlp.n_iter_
+        if len(test):
+            result["probs"][alpha] = mlp.predict_proba(scaler.transform(X[test]))[:, 1]
+        if keep_models:
+            result["models"][alpha] = mlp
+    return result
+
+def _rf_fold(z, y, train, test, rf_params, sizes, threads):
+    # warm_start grows one forest through the sweep; each size reuses the trees before it
+    # and matches a forest fitted directly at that size with the same random_state
+    rf = RandomForestClassifier(**rf_params, n_jobs=threads, warm_start=True)
+    result = {"probs": {}, "n_iter": {}}
+    with warnings.catch_warnings():
+        # The presets warning is about refitting on different data; every step here sees the same fold
+        warnings.filterwarnings("ignore", message="class_weight presets", category=UserWarning)
+        for size in sizes:
+            rf.set_params(n_estimators=size).fit(z[train], y[train])
+            result["probs"][size] = rf.predict_proba(z[test])[:, 1]
+    return result
+
+def _pool_context():
+    # Same policy as ingestion: fan out with fork, run serially where it is unavailable
+    if "fork" in mp.get_all_start_methods():
+        return mp.get_context("fork")
+    return None
+
+def resource_plan(n_tasks, task_mb, cpus=None, memory_mb=None):
+    # Concurrent workers and per-worker threads that fit the CPU and memory budgets
+    cpus = cpus or os.cpu_count() or 1
+    workers = max(1, min(n_tasks, cpus))
+    if memory_mb:
+        workers = max(1, min(workers, int(memory_mb // max(task_mb, 1.0))))
+    return workers, max(1, cpus // workers)
+
+def _estimate_mlp_mb(n_rows, n_features, hidden):
+    # Full-batch predict holds every layer's activations (and sklearn keeps a second buffer)
+    return 64 + n_rows * (n_features + sum(hidden) + 1) * 8 * 2 / 2**20
+
+def _estimate_rf_mb(n_rows, n_trees):
+    # Trees grown to purity on one feature have ~n/2 nodes of ~80 bytes each
+    return 64 + n_trees * n_rows * 0.5 * 80 / 2**20
+
+def _run_tasks(tasks, workers, threads):
+    ctx = _pool_context()
+    if ctx is None or workers <= 1:
+        with threadpool_limits(limits=threads):
+            return [_measured(fn, *args) for _, fn, args in tasks]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_limit_threads, initargs=(threads,)) as pool:
+        futures = [pool.submit(_measured, fn, *args) for _, fn, args in tasks]
+        return [future.result() for future in futures]
+
+def _best(candidates, y, probs):
+    # Highest out-of-fold average precision; ties go to the earlier (cheaper) candidate
+    scores = {c: average_precision_score(y, probs[c]) for c in candidates}
+    return max(candidates, key=lambda c: (scores[c], -candidates.index(c))), scores
+
+def train_oof_stacked_model(df_agg, model_dir, params=None, cpus=None, memory_mb=None):
+    print("🤖 Step 3: Training Out-of-Fold Stacked Ensemble...")
+    params = resolve_params(params)
+    oof = params["oof"]
+    X = df_agg[MODEL_FEATURES].values.astype(np.float64)
+    y = df_agg['is_target'].values
+    n = len(y)
+    folds = list(StratifiedKFold(n_splits=oof["folds"], shuffle=True,
+                                 random_state=params["mlp"].get("random_state")).split(X, y))
+    alphas = list(oof["mlp_alphas"])
+    sizes = sorted(oof["rf_sizes"])
+    mlp_params = {**params["mlp"], "early_stopping": True,
+                  "validation_fraction": oof["validation_fraction"], "n_iter_no_change": oof["n_iter_no_change"]}
+    timings = []
+
+    # Level 1: per-fold MLPs give every gene a probability from a model that never saw it.
+    # The full-data MLP used for serving trains alongside them.
+    tasks = [(f"mlp fold {k}", _mlp_fold, (X, y, train, test, mlp_params, alphas))
+             for k, (train, test) in enumerate(folds)]
+    tasks.append(("mlp full", _mlp_fold, (X, y, np.arange(n), np.arange(0), mlp_params, alphas, True)))
+    task_mb = _estimate_mlp_mb(n, X.shape[1], mlp_params["hidden_layer_sizes"])
+    workers, threads = resource_plan(len(tasks), task_mb, cpus, memory_mb)
+    print(f"   MLP: {len(tasks)} fits on {workers} workers x {threads} threads (~{task_mb:.0f} MB each)")
+    results = _run_tasks(tasks, workers, threads)
+    timings += [(label, r) for (label, _, _), r in zip(tasks, results)]
+    full = results.pop()
+
+    oof_mlp = {alpha: np.empty(n) for alpha in alphas}
+    for (train, test), result in zip(folds, results):
+        for alpha in alphas:
+            oof_mlp[alpha][test] = result["probs"][alpha]
+    best_alpha, alpha_scores = _best(alphas, y, oof_mlp)
+    z = oof_mlp[best_alpha].reshape(-1, 1)
+
+    # Level 2: the RF stacker and the threshold only ever see out-of-fold inputs
+    task_mb = _estimate_rf_mb(n * (oof["folds"] - 1) / oof["folds"], sizes[-1])
+    workers, threads = resource_plan(len(folds), task_mb, cpus, memory_mb)
+    print(f"   RF: {len(folds)} fold sweeps over {sizes} trees on {workers} workers x {threads} threads (~{task_mb:.0f} MB each)")
+    tasks = [(f"rf fold {k}", _rf_fold, (z, y, train, test, params["rf"], sizes, threads))
+             for k, (train, test) in enumerate(folds)]
+    results = _run_tasks(tasks, workers, threads)
+    timings += [(label, r) for (label, _, _), r in zip(tasks, results)]
+
+    oof_final = {size: np.empty(n) for size in sizes}
+    for (train, test), result in zip(folds, results):
+        for size in sizes:
+            oof_final[size][test] = result["probs"][size]
+    best_size, size_scores = _best(sizes, y, oof_final)
+
+    print("⏱️ Fold timings:")
+    for label, r in timings:
+        iters = f"  iters {max(r['n_iter'].values())}" if r["n_iter"] else ""
+        print(f"   {label:<11} {r['seconds']:8.2f}s  peak RSS {r['peak_mb']:7.1f} MB  pid {r['pid']}{iters}")
+    print(f"   MLP alpha OOF AP: " + ", ".join(f"{a}={s:.4f}" for a, s in alpha_scores.items()) + f" -> {best_alpha}")
+    print(f"   RF trees  OOF AP: " + ", ".join(f"{t}={s:.4f}" for t, s in size_scores.items()) + f" -> {best_size}")
+
+    # Serving models: full-data MLP at the chosen alpha, RF stacked on the out-of-fold probabilities
+    scaler, mlp = full["scaler"], full["models"][best_alpha]
+    rf = RandomForestClassifier(**{**params["rf"], "n_estimators": best_size},
+                                n_jobs=cpus or os.cpu_count() or 1).fit(z, y)
+    return _finish(scaler, mlp, rf, y, oof_final[best_size], params, model_dir)
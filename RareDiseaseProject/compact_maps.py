@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+import cache_store
+
+ARRAYS = ['key_data', 'key_offsets', 'value_data', 'value_offsets', 'indptr', 'values', 'reverse_indptr', 'reverse']
+
+
+class StringTable:
+    # Interned strings packed end to end as UTF-8: string i is data[offsets[i]:offsets[i + 1]].
+    # Each distinct string is decoded once on load, so a lookup is a list index.
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+        blob, bounds = bytes(data), offsets.tolist()
+        self.strings = [blob[a:b].decode("utf-8") for a, b in zip(bounds[:-1], bounds[1:])]
+
+    def __len__(self):
+        return len(self.strings)
+
+    def __getitem__(self, code):
+        return self.strings[code]
+
+    def decode(self, codes):
+        strings = self.strings
+        return [strings[code] for code in codes.tolist()]
+
+
+def encode_strings(strings):
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+# key -> distinct values multimap in CSR form over two string tables: the values of key
+# code k are values[indptr[k]:indptr[k + 1]], codes into the value table. `reverse`
+# holds the same layout from value code to key codes. Every array is flat, so the map
+# memory-maps from the cache and gunicorn workers share its pages.
+class CompactMap:
+    def __init__(self, arrays):
+        # Plain ndarray views of the memory-mapped arrays: slicing np.memmap is several
+        # times slower and a lookup slices twice
+        for name in ARRAYS:
+            setattr(self, name, arrays[name].view(np.ndarray))
+        self.key_table = StringTable(self.key_data, self.key_offsets)
+        self.value_table = StringTable(self.value_data, self.value_offsets)
+        self.key_code = {key: code for code, key in enumerate(self.key_table.strings)}
+        # Built on the first reverse lookup; most workers never make one
+        self._value_code = None
+
+    def __len__(self):
+        return len(self.key_code)
+
+    def __contains__(self, key):
+        return key in self.key_code
+
+    def keys(self):
+        return list(self.key_table.strings)
+
+    def counts(self):
+        # Number of values of every key, by key code
+        return np.diff(self.indptr)
+
+    def codes(self, keys):
+        # Key codes of `keys`, -1 where a key is absent
+        return np.array([self.key_code.get(key, -1) for key in keys], dtype=np.int64)
+
+    def count(self, key):
+        code = self.key_code.get(key)
+        return 0 if code is None else int(self.indptr[code + 1] - self.indptr[code])
+
+    def get(self, key, limit=None):
+        code = self.key_code.get(key)
+        if code is None:
+            return []
+        start, end = int(self.indptr[code]), int(self.indptr[code + 1])
+        if limit is not None:
+            end = min(end, start + limit)
+        return self.value_table.decode(self.values[start:end])
+
+    def largest(self, n):
+        # The n keys with the most values; ties keep insertion order, like a stable sort
+        return self.key_table.decode(np.argsort(-self.counts(), kind='stable')[:n])
+
+    def value_code(self, value):
+        # Exact match first, then case-insensitive
+        if self._value_code is None:
+            names = self.value_table.strings
+            lookup = {}
+            for code, name in enumerate(names):
+                lookup.setdefault(name.casefold(), code)
+            lookup.update({name: code for code, name in enumerate(names)})
+            self._value_code = lookup
+        code = self._value_code.get(value)
+        return self._value_code.get(str(value).casefold()) if code is None else code
+
+    def keys_for(self, value, limit=None):
+        # Reverse lookup: the keys whose values include `value`, in key order
+        code = self.value_code(value)
+        if code is None:
+            return []
+        start, end = int(self.reverse_indptr[code]), int(self.reverse_indptr[code + 1])
+        if limit is not None:
+            end = min(end, start + limit)
+        return self.key_table.decode(self.reverse[start:end])
+
+
+def build_map(keys, values, sort_values=False):
+    # Pairs are deduplicated by hashing (drop_duplicates) rather than a membership scan of
+    # each key's list. Keys keep first-appearance order; each key's values keep it too,
+    # or are sorted A-Z with sort_values=True.
+    frame = pd.DataFrame({"key": np.asarray(keys, dtype=object), "value": np.asarray(values, dtype=object)})
+    frame = frame.dropna().drop_duplicates()
+    key_codes, key_names = pd.factorize(frame["key"])
+    value_codes, value_names = pd.factorize(frame["value"], sort=sort_values)
+    if sort_values:
+        order = np.lexsort((value_codes, key_codes))
+    else:
+        order = np.argsort(key_codes, kind='stable')
+    key_codes, value_codes = key_codes[order], value_codes[order]
+
+    indptr = np.zeros(len(key_names) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(key_codes, minlength=len(key_names)), out=indptr[1:])
+    reverse_order = np.argsort(value_codes, kind='stable')
+    reverse_indptr = np.zeros(len(value_names) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(value_codes, minlength=len(value_names)), out=reverse_indptr[1:])
+
+    key_data, key_offsets = encode_strings(key_names.tolist())
+    value_data, value_offsets = encode_strings(value_names.tolist())
+    return CompactMap({
+        'key_data': key_data,
+        'key_offsets': key_offsets,
+        'value_data': value_data,
+        'value_offsets': value_offsets,
+        'indptr': indptr,
+        'values': value_codes.astype(np.int32),
+        'reverse_indptr': reverse_indptr,
+        'reverse': key_codes[reverse_order].astype(np.int32),
+    })
+
+
+def save_map(name, compact, sources, cache_dir=None):
+    store = cache_store.entry_dir(name, cache_dir)
+    store.mkdir(parents=True, exist_ok=True)
+    cache_store.invalidate(name, cache_dir)
+    for array in ARRAYS:
+        cache_store.save_array(store / f"{array}.npy", getattr(compact, array))
+    cache_store.write_meta(name, sources, cache_dir)
+
+
+def load_saved(name, sources, cache_dir=None, mmap_mode='r'):
+    if not cache_store.meta_is_current(name, sources, cache_dir):
+        return None
+    store = cache_store.entry_dir(name, cache_dir)
+    try:
+        return CompactMap({array: np.load(store / f"{array}.npy", mmap_mode=mmap_mode, allow_pickle=False)
+                           for array in ARRAYS})
+    except Exception as e:
+        print(f"⚠️ {name} cache unreadable: {e}")
+        return None
+
+
+def save_and_reopen(name, compact, sources, cache_dir=None):
+    save_map(name, compact, sources, cache_dir)
+    # Reopen memory-mapped so the built copy can be freed
+    reopened = load_saved(name, sources, cache_dir)
+    return compact if reopened is None else reopened
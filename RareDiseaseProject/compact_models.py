@@ -0,0 +1,297 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+import cache_store
+import utils
+
+STORE_NAME = "compact_models"
+MODEL_FILES = ["hyper_scaler.pkl", "hyper_mlp.pkl", "hyper_rf.pkl", "hyper_threshold.pkl"]
+SPEC_FILE = "model.json"
+# Bump when the exported array layout changes so existing exports are rebuilt
+FORMAT_VERSION = 1
+# Every export is checked against scikit-learn on this many probe rows before it is saved
+PROBE_ROWS = 2048
+PROBE_TOLERANCE = 1e-9
+
+_ACTIVATIONS = {
+    "identity": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0, out=x),
+    "tanh": lambda x: np.tanh(x, out=x),
+    "logistic": lambda x: np.divide(1.0, 1.0 + np.exp(-x), out=x),
+}
+
+
+# NumPy-only evaluator for the scaler -> MLP -> RF ensemble. Weights and the trees of the
+# forest (flattened into one node table) are plain .npy arrays that can be memory-mapped,
+# so loading costs a few page-table entries instead of unpickling a large object graph.
+class CompactEnsemble:
+    def __init__(self, arrays, spec):
+        self.arrays = arrays
+        self.spec = spec
+        self.threshold = spec["threshold"]
+        self.coefs = [arrays[f"mlp_w{i}"] for i in range(spec["mlp_layers"])]
+        self.intercepts = [arrays[f"mlp_b{i}"] for i in range(spec["mlp_layers"])]
+
+    def scale(self, X):
+        X = np.array(X, dtype=np.float64)
+        X -= self.arrays["scaler_center"]
+        X /= self.arrays["scaler_scale"]
+        return X
+
+    def mlp_proba(self, X):
+        # Same layer order and activations as MLPClassifier._forward_pass_fast
+        activation = X
+        last = len(self.coefs) - 1
+        for i, (W, b) in enumerate(zip(self.coefs, self.intercepts)):
+            activation = activation @ W
+            activation += b
+            name = self.spec["mlp_activation"] if i != last else self.spec["mlp_out_activation"]
+            activation = _ACTIVATIONS[name](activation)
+        return activation[:, -1]
+
+    def rf_proba(self, X):
+        # Trees compare float32 features against float64 thresholds, like sklearn's tree code
+        X = np.asarray(X, dtype=np.float32)
+        if "rf_step_thresholds" in self.arrays:
+            # Single-input forest: the whole ensemble is one step function of x
+            index = np.searchsorted(self.arrays["rf_step_thresholds"], X[:, 0].astype(np.float64), side="left")
+            return self.arrays["rf_step_values"][index]
+        leaf_values = self.arrays["tree_value"][_descend(self.arrays, X)]
+        # Accumulate tree by tree in estimator order, as RandomForestClassifier does
+        total = np.zeros(len(X), dtype=np.float64)
+        for t in range(leaf_values.shape[1]):
+            total += leaf_values[:, t]
+        return total / leaf_values.shape[1]
+
+    def predict_proba(self, X):
+        mlp_probs = self.mlp_proba(self.scale(X)).reshape(-1, 1)
+        return self.rf_proba(mlp_probs)
+
+    def predict(self, X):
+        return (self.predict_proba(X) >= self.threshold).astype(int)
+
+
+class PickledEnsemble:
+    # The scikit-learn models behind the CompactEnsemble interface; served when an export
+    # is refused, and the reference every export is checked against
+    def __init__(self, models):
+        self.scaler, self.mlp, self.rf, self.threshold = models
+        self.spec = {"format": "pickle"}
+
+    def predict_proba(self, X):
+        mlp_probs = self.mlp.predict_proba(self.scaler.transform(X))[:, 1].reshape(-1, 1)
+        return self.rf.predict_proba(mlp_probs)[:, 1]
+
+    def predict(self, X):
+        return (self.predict_proba(X) >= self.threshold).astype(int)
+
+
+class ExportMismatch(RuntimeError):
+    pass
+
+
+def _descend(arrays, X, roots=None):
+    # Leaf node reached by every (sample, tree) pair; only cursors on split nodes advance
+    left, right = arrays["tree_left"], arrays["tree_right"]
+    feature, threshold = arrays["tree_feature"], arrays["tree_threshold"]
+    roots = arrays["tree_roots"] if roots is None else roots
+    samples = np.repeat(np.arange(len(X)), len(roots))
+    nodes = np.tile(roots, len(X)).astype(np.int64)
+    active = np.flatnonzero(left[nodes] >= 0)
+    while len(active):
+        node = nodes[active]
+        go_left = X[samples[active], feature[node]] <= threshold[node]
+        nodes[active] = np.where(go_left, left[node], right[node])
+        active = active[left[nodes[active]] >= 0]
+    return nodes.reshape(len(X), len(roots))
+
+
+def _step_table(arrays):
+    # With one input feature, a tree is constant between consecutive split thresholds.
+    # Evaluate each tree once per interval of the union of all thresholds (the interval's
+    # upper bound is a representative point) and sum in estimator order.
+    roots, ends = arrays["tree_roots"], np.append(arrays["tree_roots"][1:], len(arrays["tree_left"]))
+    splits = arrays["tree_left"] >= 0
+    grid = np.unique(arrays["tree_threshold"][splits])
+    points = np.append(grid, np.inf)
+    total = np.zeros(len(points), dtype=np.float64)
+    for root, end in zip(roots, ends):
+        own = np.unique(arrays["tree_threshold"][root:end][splits[root:end]])
+        own_points = np.append(own, np.inf).reshape(-1, 1)
+        values = arrays["tree_value"][_descend(arrays, own_points, roots=np.array([root]))[:, 0]]
+        total += values[np.searchsorted(own, points, side="left")]
+    return grid, total / len(roots)
+
+
+def export_arrays(scaler, mlp, rf, threshold):
+    n_features = len(scaler.center_ if scaler.center_ is not None else scaler.scale_)
+    arrays = {
+        "scaler_center": np.zeros(n_features) if scaler.center_ is None else np.asarray(scaler.center_, dtype=np.float64),
+        "scaler_scale": np.ones(n_features) if scaler.scale_ is None else np.asarray(scaler.scale_, dtype=np.float64),
+    }
+    for i, (W, b) in enumerate(zip(mlp.coefs_, mlp.intercepts_)):
+        arrays[f"mlp_w{i}"] = np.ascontiguousarray(W, dtype=np.float64)
+        arrays[f"mlp_b{i}"] = np.ascontiguousarray(b, dtype=np.float64)
+
+    # Flatten every tree into one node table; child ids are shifted by the tree's offset
+    # and leaves keep -1 children. tree_value is the leaf's normalised positive-class share.
+    left, right, feature, split, value, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator in rf.estimators_:
+        tree = estimator.tree_
+        is_leaf = tree.children_left < 0
+        roots.append(offset)
+        left.append(np.where(is_leaf, -1, tree.children_left + offset))
+        right.append(np.where(is_leaf, -1, tree.children_right + offset))
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        split.append(tree.threshold)
+        counts = tree.value[:, 0, :]
+        normalizer = counts.sum(axis=1)
+        normalizer[normalizer == 0.0] = 1.0
+        value.append(counts[:, -1] / normalizer)
+        offset += tree.node_count
+    arrays.update({
+        "tree_left": np.concatenate(left).astype(np.int32),
+        "tree_right": np.concatenate(right).astype(np.int32),
+        "tree_feature": np.concatenate(feature).astype(np.int32),
+        "tree_threshold": np.concatenate(split).astype(np.float64),
+        "tree_value": np.concatenate(value).astype(np.float64),
+        "tree_roots": np.array(roots, dtype=np.int64),
+    })
+    if rf.n_features_in_ == 1:
+        arrays["rf_step_thresholds"], arrays["rf_step_values"] = _step_table(arrays)
+    spec = {
+        "format": FORMAT_VERSION,
+        "threshold": float(threshold),
+        "n_features": int(n_features),
+        "mlp_layers": len(mlp.coefs_),
+        "mlp_activation": mlp.activation,
+        "mlp_out_activation": mlp.out_activation_,
+        "rf_trees": len(rf.estimators_),
+        "rf_nodes": int(offset),
+    }
+    return arrays, spec
+
+
+def model_sources(model_dir):
+    return [model_dir / name for name in MODEL_FILES]
+
+
+def load_pickled(model_dir):
+    import joblib
+    return tuple(joblib.load(path) for path in model_sources(model_dir))
+
+
+def save_compact(arrays, spec, sources, cache_dir=None):
+    # Every file is replaced by rename, so workers that already memory-mapped the previous
+    # export keep reading it intact
+    store = cache_store.entry_dir(STORE_NAME, cache_dir)
+    store.mkdir(parents=True, exist_ok=True)
+    cache_store.invalidate(STORE_NAME, cache_dir)
+    for name, array in arrays.items():
+        cache_store.save_array(store / f"{name}.npy", array)
+    spec_json = json.dumps({**spec, "arrays": sorted(arrays)}, indent=2)
+    cache_store.write_atomic(store / SPEC_FILE, spec_json.encode("utf-8"))
+    cache_store.write_meta(STORE_NAME, sources, cache_dir)
+    for old in store.glob("*.npy"):
+        if old.stem not in arrays:
+            old.unlink(missing_ok=True)
+
+
+def load_compact(sources, cache_dir=None, mmap_mode='r'):
+    if not cache_store.meta_is_current(STORE_NAME, sources, cache_dir):
+        return None
+    store = cache_store.entry_dir(STORE_NAME, cache_dir)
+    try:
+        spec = json.loads((store / SPEC_FILE).read_text(encoding="utf-8"))
+        if spec.get("format") != FORMAT_VERSION:
+            return None
+        arrays = {name: np.load(store / f"{name}.npy", mmap_mode=mmap_mode, allow_pickle=False)
+                  for name in spec.pop("arrays")}
+        return CompactEnsemble(arrays, spec)
+    except Exception as e:
+        print(f"⚠️ Compact model cache unreadable: {e}")
+        return None
+
+
+def compare(models, compact, X):
+    # Compact evaluator vs the pickled scikit-learn models on X
+    threshold = models[3]
+    expected = PickledEnsemble(models).predict_proba(X)
+    got = compact.predict_proba(X)
+    return {
+        "rows": len(X),
+        "max_abs_diff": float(np.abs(expected - got).max()) if len(X) else 0.0,
+        "prediction_mismatches": int(((expected >= threshold) != (got >= threshold)).sum()),
+    }
+
+
+def probe_rows(arrays, rows=PROBE_ROWS, seed=0):
+    # Feature rows spread around the scaler's centre, with heavy tails to reach outer splits
+    rng = np.random.default_rng(seed)
+    spread = rng.standard_t(df=3, size=(rows, len(arrays["scaler_center"])))
+    return arrays["scaler_center"] + arrays["scaler_scale"] * spread
+
+
+def _export_models(model_dir, cache_dir=None, models=None):
+    models = models or load_pickled(model_dir)
+    arrays, spec = export_arrays(*models)
+    # Refuse to publish an export that does not reproduce scikit-learn
+    check = compare(models, CompactEnsemble(arrays, spec), probe_rows(arrays))
+    if check["prediction_mismatches"] or check["max_abs_diff"] > PROBE_TOLERANCE:
+        raise ExportMismatch(f"compact export disagrees with scikit-learn: {check}")
+    spec["export_check"] = check
+    save_compact(arrays, spec, model_sources(model_dir), cache_dir)
+    return spec
+
+
+def export_models(model_dir, cache_dir=None, models=None):
+    # Called by training once the pickles are saved. A failed or refused export is logged
+    # and nothing is published: the trained pickles stand, and load_models serves them.
+    with cache_store.build_lock(STORE_NAME, cache_dir):
+        try:
+            return _export_models(model_dir, cache_dir, models)
+        except Exception as e:
+            print(f"⚠️ Compact model export skipped, serving will use the pickles: {e}")
+            return None
+
+
+def load_models(model_dir, cache_dir=None, rebuild=False):
+    sources = model_sources(model_dir)
+    # Workers that load lazily can all miss the cache after a retrain; one exports while
+    # the rest wait and then map its result
+    with cache_store.build_lock(STORE_NAME, cache_dir):
+        model = None if rebuild else load_compact(sources, cache_dir)
+        if model is not None:
+            print(f"⚡ Memory-mapped compact models ({model.spec['rf_nodes']:,} tree nodes) from cache")
+            return model
+        print("🌲 Exporting pickled models to compact arrays...")
+        start = time.perf_counter()
+        try:
+            spec = _export_models(model_dir, cache_dir)
+        except ExportMismatch as e:
+            print(f"⚠️ {e}; serving the pickled models")
+            return PickledEnsemble(load_pickled(model_dir))
+        print(f"✅ Exported {spec['rf_trees']} trees / {spec['rf_nodes']:,} nodes in {time.perf_counter() - start:.1f}s")
+        return load_compact(sources, cache_dir)
+
+
+def verify(model_dir, X, cache_dir=None):
+    return compare(load_pickled(model_dir), load_models(model_dir, cache_dir), X)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the trained ensemble to compact .npy arrays")
+    parser.add_argument("--force", action="store_true", help="re-export even if the compact copy is up to date")
+    parser.add_argument("--verify", type=int, metavar="N", help="check N rows of the results file against scikit-learn")
+    args = parser.parse_args()
+    utils.ensure_directories()
+    load_models(utils.MOD_DIR, rebuild=args.force)
+    if args.verify:
+        import pandas as pd
+        from data_processing import MODEL_FEATURES
+        results = pd.read_csv(utils.BASE_DIR / "top_biological_targets.csv", nrows=args.verify)
+        print(f"🔎 {verify(utils.MOD_DIR, results[MODEL_FEATURES].to_numpy(dtype=np.float64))}")
@@ -1,39 +1,37 @@
+import numpy as np
 import pandas as pd
-import xml.etree.ElementTree as ET
 import gc
-import os
-
-def parse_xml_to_df(path, file_type="orphanet"):
-    if path is None or not os.path.exists(path):
-        return pd.DataFrame(columns=['gene_symbol', 'is_target', 'existing_drugs'])
-    data = []
-    try:
-        tree = ET.parse(path)
-        root = tree.getroot()
-        if file_type == "orphanet":
-            for gene in root.iter('Gene'):
-                symbol = gene.find('Symbol')
-                if symbol is not None: 
-                    data.append({'gene_symbol': symbol.text, 'is_target': 1, 'existing_drugs': None})
-        elif file_type == "drugbank":
-            # Extract Drug Names alongside Gene Symbols
-            for drug in root.findall('.//{*}drug'):
-                drug_name = drug.find('{*}name').text if drug.find('{*}name') is not None else "Unknown Drug"
-                for target in drug.findall('.//{*}target'):
-                    for poly in target.findall('.//{*}polypeptide'):
-                        sym = poly.find('.//{*}gene-name')
-                        if sym is not None: 
-                            data.append({
-                                'gene_symbol': sym.text.upper() if sym.text else None, 
-                                'is_target': 1,
-                                'existing_drugs': drug_name
-                            })
-        return pd.DataFrame(data).dropna(subset=['gene_symbol'])
-    except Exception as e:
-        print(f"❌ XML Error: {e}")
-        return pd.DataFrame(columns=['gene_symbol', 'is_target', 'existing_drugs'])
-
-def get_optimized_aggregated_data(ppi_path, info_path, p1_path, p6_path, db_path):
+
+import ingestion
+import ppi_store
+
+AGG_COLUMNS = ['gene_symbol', 'ppi_mean', 'ppi_max', 'ppi_std', 'ppi_skew',
+               'interaction_count', 'degree_max', 'degree_mean', 'is_target', 'existing_drugs']
+PPI_CHUNK_ROWS = 2_000_000
+# Inputs of the MLP+RF ensemble, in training column order
+MODEL_FEATURES = ['ppi_mean', 'ppi_max', 'ppi_std', 'ppi_skew', 'interaction_count', 'degree_max', 'degree_mean']
+
+def load_target_tables(p1_path, p6_path, db_path, rebuild=False):
+    corpus = ingestion.load_corpus([p1_path, p6_path], db_path, rebuild=rebuild)
+    orphanet = ingestion.orphanet_rows(corpus)
+    db = ingestion.drugbank_rows(corpus)
+    
+    # Merge drugs into a comma-separated string for each gene
+    db_drugs = db.assign(existing_drugs=db['drug_name'].fillna("Unknown Drug"))
+    drug_list = db_drugs.groupby('gene_symbol')['existing_drugs'].apply(lambda x: ', '.join(sorted(set(x)))).reset_index()
+    
+    symbols = pd.concat([orphanet['gene_symbol'], db['gene_symbol']]).drop_duplicates()
+    targets = pd.DataFrame({'gene_symbol': symbols.to_numpy(), 'is_target': 1})
+    return targets, drug_list
+
+def get_optimized_aggregated_data(ppi_path, info_path, p1_path, p6_path, db_path,
+                                  mode="pandas", chunksize=PPI_CHUNK_ROWS):
+    if mode == "streaming":
+        return get_streaming_aggregated_data(ppi_path, info_path, p1_path, p6_path, db_path, chunksize)
+    if mode == "columnar":
+        return get_columnar_aggregated_data(ppi_path, info_path, p1_path, p6_path, db_path, chunksize)
+    if mode != "pandas":
+        raise ValueError(f"Unknown aggregation mode: {mode}")
     print("🧬 Step 2: Advanced Feature Engineering with Drug Mapping...")
     ppi = pd.read_csv(ppi_path, sep=' ')
     info = pd.read_csv(info_path, sep='\t')
@@ -41,14 +39,7 @@ def get_optimized_aggregated_data(ppi_path, info_path, p1_path, p6_path, db_path
     ppi['gene_symbol'] = ppi['protein1'].map(mapping)
     ppi['network_degree'] = ppi.groupby('gene_symbol')['gene_symbol'].transform('count')
     
-    p1 = parse_xml_to_df(p1_path, "orphanet")
-    p6 = parse_xml_to_df(p6_path, "orphanet")
-    db = parse_xml_to_df(db_path, "drugbank")
-    
-    # Merge drugs into a comma-separated string for each gene
-    drug_list = db.groupby('gene_symbol')['existing_drugs'].apply(lambda x: ', '.join(set(x.dropna()))).reset_index()
-    
-    targets = pd.concat([p1, p6, db[['gene_symbol', 'is_target']]]).drop_duplicates(subset=['gene_symbol'])
+    targets, drug_list = load_target_tables(p1_path, p6_path, db_path)
     
     df = pd.merge(ppi, targets, on='gene_symbol', how='left')
     df = pd.merge(df, drug_list, on='gene_symbol', how='left') # Add drugs to main dataframe
@@ -62,8 +53,118 @@ def get_optimized_aggregated_data(ppi_path, info_path, p1_path, p6_path, db_path
         'existing_drugs': 'first' # Keep the drug names
     }).reset_index()
     
-    df_agg.columns = ['gene_symbol', 'ppi_mean', 'ppi_max', 'ppi_std', 'ppi_skew', 
-                      'interaction_count', 'degree_max', 'degree_mean', 'is_target', 'existing_drugs']
+    df_agg.columns = AGG_COLUMNS
     
     gc.collect()
-    return df_agg.fillna(0)
\ No newline at end of file
+    return df_agg.fillna(0)
+
+def _accumulate_moments(acc, codes, scores):
+    # Raw power sums of integer scores stay exact in float64 (< 2**53) for STRING-sized groups
+    n = len(acc['count'])
+    x = scores.astype(np.float64)
+    acc['count'] += np.bincount(codes, minlength=n)
+    acc['s1'] += np.bincount(codes, weights=x, minlength=n)
+    acc['s2'] += np.bincount(codes, weights=x * x, minlength=n)
+    acc['s3'] += np.bincount(codes, weights=x * x * x, minlength=n)
+    np.maximum.at(acc['max'], codes, scores.astype(np.int64))
+
+def _new_moment_accumulator(n_genes):
+    return {
+        'count': np.zeros(n_genes, dtype=np.int64),
+        's1': np.zeros(n_genes, dtype=np.float64),
+        's2': np.zeros(n_genes, dtype=np.float64),
+        's3': np.zeros(n_genes, dtype=np.float64),
+        'max': np.full(n_genes, np.iinfo(np.int64).min, dtype=np.int64),
+    }
+
+def _finalize_moments(acc, symbols):
+    seen = acc['count'] > 0
+    count = acc['count'][seen]
+    # Central moments from exact integer numerators (Python ints: S1**3 overflows int64)
+    n = count.astype(object)
+    s1 = acc['s1'][seen].astype(np.int64).astype(object)
+    s2 = acc['s2'][seen].astype(np.int64).astype(object)
+    s3 = acc['s3'][seen].astype(np.int64).astype(object)
+    m2 = ((n * s2 - s1 * s1) / n).astype(np.float64)
+    m3 = ((n * n * s3 - 3 * n * s1 * s2 + 2 * s1 * s1 * s1) / (n * n)).astype(np.float64)
+    nf = count.astype(np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std = np.where(count > 1, np.sqrt(m2 / (nf - 1)), np.nan)
+        # Bias-corrected sample skewness, same definition as pandas' skew()
+        skew = (nf * np.sqrt(nf - 1) / (nf - 2)) * (m3 / m2 ** 1.5)
+    skew = np.where(m2 == 0, 0.0, skew)
+    skew = np.where(count < 3, np.nan, skew)
+
+    return pd.DataFrame({
+        'gene_symbol': np.asarray(symbols, dtype=object)[seen],
+        'ppi_mean': acc['s1'][seen] / nf,
+        'ppi_max': acc['max'][seen],
+        'ppi_std': std,
+        'ppi_skew': skew,
+        'interaction_count': count,
+        'degree_max': count,
+        'degree_mean': nf,
+    })
+
+def features_from_edges(gene_symbols, scores):
+    # Model features for ad-hoc edge lists (gene_symbols[i] is the protein1 side of edge i),
+    # computed with the same moment kernels as the training aggregation
+    symbols, codes = np.unique(np.asarray(gene_symbols, dtype=object), return_inverse=True)
+    acc = _new_moment_accumulator(len(symbols))
+    _accumulate_moments(acc, codes.astype(np.int64), np.asarray(scores, dtype=np.int64))
+    return _finalize_moments(acc, symbols).fillna(0)
+
+def build_feature_table(features, targets, drug_list):
+    # Joins per-gene PPI features with the Orphanet/DrugBank labels into df_agg
+    is_target = features['gene_symbol'].isin(targets['gene_symbol'])
+    drugs = dict(zip(drug_list['gene_symbol'], drug_list['existing_drugs']))
+    features['is_target'] = is_target.astype(int)
+    features['existing_drugs'] = features['gene_symbol'].map(drugs)
+    return features[AGG_COLUMNS].fillna(0)
+
+def get_streaming_aggregated_data(ppi_path, info_path, p1_path, p6_path, db_path, chunksize=PPI_CHUNK_ROWS):
+    print("🧬 Step 2: Streaming Feature Engineering with Drug Mapping...")
+    info = pd.read_csv(info_path, sep='\t', usecols=['string_protein_id', 'preferred_name'])
+    symbols = sorted(info['preferred_name'].dropna().unique())
+    gene_code = {sym: i for i, sym in enumerate(symbols)}
+    protein_gene = {p: gene_code[g] for p, g in zip(info['string_protein_id'], info['preferred_name']) if g in gene_code}
+    del info
+
+    acc = _new_moment_accumulator(len(symbols))
+    reader = pd.read_csv(ppi_path, sep=' ', usecols=['protein1', 'combined_score'],
+                         dtype={'protein1': 'category', 'combined_score': np.int32}, chunksize=chunksize)
+    for chunk in reader:
+        protein = chunk['protein1'].cat
+        # Resolve each distinct protein id once per chunk instead of once per row
+        # Trailing -1 catches the -1 code pandas uses for missing ids
+        category_gene = np.array([protein_gene.get(p, -1) for p in protein.categories] + [-1], dtype=np.int64)
+        codes = category_gene[protein.codes.to_numpy()]
+        mapped = codes >= 0
+        _accumulate_moments(acc, codes[mapped], chunk['combined_score'].to_numpy()[mapped])
+
+    features = _finalize_moments(acc, symbols)
+    targets, drug_list = load_target_tables(p1_path, p6_path, db_path)
+    df_agg = build_feature_table(features, targets, drug_list)
+
+    gc.collect()
+    return df_agg
+
+def get_columnar_aggregated_data(ppi_path, info_path, p1_path, p6_path, db_path, chunksize=PPI_CHUNK_ROWS):
+    print("🧬 Step 2: Columnar Feature Engineering with Drug Mapping...")
+    features = edge_features(ppi_store.load_ppi(ppi_path, info_path), chunksize)
+    targets, drug_list = load_target_tables(p1_path, p6_path, db_path)
+    df_agg = build_feature_table(features, targets, drug_list)
+
+    gc.collect()
+    return df_agg
+
+def edge_features(edges, chunksize=PPI_CHUNK_ROWS):
+    # Per-gene score moments over an EncodedPPI edge table
+    acc = _new_moment_accumulator(len(edges.genes))
+    # Walk the memory-mapped arrays in blocks so temporaries stay bounded
+    for start in range(0, len(edges), chunksize):
+        codes = edges.gene_codes(edges.protein1[start:start + chunksize])
+        mapped = codes >= 0
+        _accumulate_moments(acc, codes[mapped], edges.score[start:start + chunksize][mapped])
+    return _finalize_moments(acc, edges.genes)
@@ -0,0 +1,130 @@
+import argparse
+import multiprocessing as mp
+import os
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import cache_store
+import utils
+
+CORPUS_NAME = "xml_corpus"
+CORPUS_COLUMNS = ['source', 'gene_symbol', 'disease_name', 'drug_name']
+DRUGBANK_NS = "{http://www.drugbank.ca}"
+
+
+def _iter_top_level(path, tag):
+    # Yields each outermost `tag` element once it is complete. Nested elements with
+    # the same tag are left in place for the caller, as root.iter() would see them.
+    depth = 0
+    context = ET.iterparse(path, events=("start", "end"))
+    _, root = next(context)
+    for event, elem in context:
+        if elem.tag != tag:
+            continue
+        if event == "start":
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 0:
+            yield elem
+            elem.clear()
+            # DrugBank drugs hang directly off the root; drop the emptied shells too
+            if len(root) > 1000:
+                root.clear()
+
+
+def iter_orphanet(path):
+    for disorder in _iter_top_level(path, 'Disorder'):
+        name_elem = disorder.find('Name')
+        name = name_elem.text if name_elem is not None else "Unknown"
+        for gene in disorder.iter('Gene'):
+            sym_elem = gene.find('Symbol')
+            if sym_elem is not None and sym_elem.text:
+                yield name, sym_elem.text
+
+
+def iter_drugbank(path):
+    for drug in _iter_top_level(path, f"{DRUGBANK_NS}drug"):
+        name_elem = drug.find(f"{DRUGBANK_NS}name")
+        drug_name = name_elem.text.strip() if name_elem is not None and name_elem.text else ""
+        for target in drug.iterfind(f".//{DRUGBANK_NS}target"):
+            for gene in target.iterfind(f".//{DRUGBANK_NS}gene-name"):
+                if gene.text and gene.text.strip():
+                    yield drug_name or None, gene.text.strip().upper()
+
+
+def _parse_source(kind, path):
+    start = time.perf_counter()
+    rows = []
+    if path is not None and os.path.exists(path):
+        try:
+            if kind == "drugbank":
+                rows = [("drugbank", gene, None, drug) for drug, gene in iter_drugbank(path)]
+            else:
+                rows = [("orphanet", gene, disease, None) for disease, gene in iter_orphanet(path)]
+        except Exception as e:
+            print(f"❌ XML Error in {os.path.basename(path)}: {e}")
+            rows = []
+    return rows, time.perf_counter() - start
+
+
+def _pool_context():
+    # Spawned workers would re-import the caller's __main__ (e.g. app.py and its engine),
+    # so only fan out where fork is available and parse serially elsewhere.
+    if "fork" in mp.get_all_start_methods():
+        return mp.get_context("fork")
+    return None
+
+
+def build_corpus(orphanet_paths, drugbank_path, workers=None):
+    jobs = [("orphanet", p) for p in orphanet_paths] + [("drugbank", drugbank_path)]
+    workers = len(jobs) if workers is None else workers
+    ctx = _pool_context()
+
+    print(f"🧾 Parsing {len(jobs)} XML sources...")
+    if ctx is not None and workers > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=ctx) as pool:
+            parsed = list(pool.map(_parse_source, *zip(*jobs)))
+    else:
+        parsed = [_parse_source(kind, path) for kind, path in jobs]
+
+    rows = []
+    for (kind, path), (source_rows, elapsed) in zip(jobs, parsed):
+        name = os.path.basename(path) if path is not None else kind
+        print(f"   {name}: {len(source_rows):,} rows in {elapsed:.1f}s")
+        rows.extend(source_rows)
+
+    corpus = pd.DataFrame(rows, columns=CORPUS_COLUMNS)
+    corpus['source'] = corpus['source'].astype('category')
+    return corpus
+
+
+def load_corpus(orphanet_paths, drugbank_path, cache_dir=None, rebuild=False, workers=None):
+    # One parse per data release: both main.py and the serving engine read this table
+    orphanet_paths = [p for p in orphanet_paths if p is not None]
+    sources = list(orphanet_paths) + ([drugbank_path] if drugbank_path is not None else [])
+    return cache_store.cached(CORPUS_NAME, sources,
+                              lambda: build_corpus(orphanet_paths, drugbank_path, workers),
+                              cache_dir=cache_dir, rebuild=rebuild)
+
+
+def orphanet_rows(corpus):
+    return corpus[corpus['source'] == "orphanet"]
+
+
+def drugbank_rows(corpus):
+    return corpus[corpus['source'] == "drugbank"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse Orphanet/DrugBank XML into the shared corpus cache")
+    parser.add_argument("--force", action="store_true", help="reparse even if the cache is up to date")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    utils.ensure_directories()
+    corpus = load_corpus([utils.DATA_DIR / "en_product1.xml", utils.DATA_DIR / "en_product6.xml"],
+                         utils.DATA_DIR / "drugbank.xml", rebuild=args.force, workers=args.workers)
+    print(f"✅ Corpus ready: {len(corpus):,} rows")
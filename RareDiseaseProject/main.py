@@ -1,8 +1,77 @@
-import utils, data_processing, classifiers, analysis
+import argparse
+import json
 
-def main():
+import utils, data_processing, classifiers, analysis, ppi_store, graph_features
+from pipeline import Stage, run_pipeline
+
+REPORT_FILE = "top_biological_targets.csv"
+MODEL_FILES = ["hyper_mlp.pkl", "hyper_rf.pkl", "hyper_scaler.pkl", "hyper_threshold.pkl"]
+STAGE_NAMES = ["edges", "labels", "features", "models", "report"]
+
+def build_stages(paths, params=None, cpus=None, memory_mb=None, graph=False):
+    # cpus/memory_mb only change how training is scheduled, not its output, so they stay out of the keys.
+    # graph=True adds the graph_* columns to the report; no model reads them, so they are off by default.
+    def edges(inputs, out_dir, params, rebuild):
+        # Memory-mapped edge table; ppi_store keeps the arrays in its own cache
+        return ppi_store.load_ppi(paths['links'], paths['info'], rebuild=rebuild)
+
+    def labels(inputs, out_dir, params, rebuild):
+        return data_processing.load_target_tables(paths['p1'], paths['p6'], paths['db'], rebuild=rebuild)
+
+    def features(inputs, out_dir, params, rebuild):
+        print("🧬 Step 2: Columnar Feature Engineering with Drug Mapping...")
+        targets, drug_list = inputs['labels']
+        df_agg = data_processing.build_feature_table(data_processing.edge_features(inputs['edges']), targets, drug_list)
+        if params.get("graph_features"):
+            df_agg = graph_features.add_graph_features(df_agg, inputs['edges'])
+        return df_agg
+
+    def models(inputs, out_dir, params, rebuild):
+        return classifiers.train_hyper_optimized_model(inputs['features'], out_dir, params,
+                                                       cpus=cpus, memory_mb=memory_mb)
+
+    def report(inputs, out_dir, params, rebuild):
+        opt_threshold, final_probs = inputs['models']
+        analysis.generate_discovery_report(inputs['features'].copy(), final_probs, opt_threshold, out_dir / REPORT_FILE)
+
+    return [
+        Stage("edges", edges, sources=[paths['links'], paths['info']], store=False),
+        Stage("labels", labels, sources=[paths['p1'], paths['p6'], paths['db']]),
+        Stage("features", features, deps=["edges", "labels"], version=3,
+              params={"graph_features": True} if graph else None),
+        Stage("models", models, deps=["features"], params=classifiers.resolve_params(params),
+              publish=[(name, utils.MOD_DIR / name) for name in MODEL_FILES]),
+        # We save to the ROOT 'top_biological_targets.csv' for the API to find easily
+        Stage("report", report, deps=["features", "models"],
+              publish=[(REPORT_FILE, utils.BASE_DIR / REPORT_FILE)]),
+    ]
+
+def parse_param(text):
+    # "rf.n_estimators=300" -> {"rf": {"n_estimators": 300}}; values are parsed as JSON when possible
+    key, _, raw = text.partition("=")
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        value = raw
+    section, _, name = key.partition(".")
+    return {section: {name: value}} if name else {section: value}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the discovery ensemble, reusing cached pipeline stages")
+    parser.add_argument("--force", action="store_true", help="rerun every stage, ignoring cached outputs")
+    parser.add_argument("--from-stage", choices=STAGE_NAMES,
+                        help="rerun this stage and everything downstream of it")
+    parser.add_argument("--param", action="append", default=[], metavar="KEY=VALUE",
+                        help="override a training hyperparameter, e.g. rf.n_estimators=300")
+    parser.add_argument("--training", choices=["in_sample", "oof"],
+                        help="in_sample (default) or out-of-fold stacking with early stopping")
+    parser.add_argument("--cpus", type=int, help="CPU budget for training (default: all cores)")
+    parser.add_argument("--memory-mb", type=int, help="memory budget that caps concurrent fold workers")
+    parser.add_argument("--graph-features", action="store_true",
+                        help="add the graph_* network columns to the report (not used by the models)")
+    args = parser.parse_args(argv)
     utils.ensure_directories()
-    
+
     PATHS = {
         "links": utils.DATA_DIR / '9606.protein.links.v11.5.txt',
         "info":  utils.DATA_DIR / '9606.protein.info.v11.5.txt',
@@ -11,20 +80,20 @@ def main():
         "p6":    utils.DATA_DIR / 'en_product6.xml'
     }
 
-    print("⏳ Step 1: Loading & Mapping Data...")
-    df_agg = data_processing.get_optimized_aggregated_data(
-        PATHS['links'], PATHS['info'], PATHS['p1'], PATHS['p6'], PATHS['db']
-    )
+    overrides = {}
+    for text in args.param:
+        for section, value in parse_param(text).items():
+            if isinstance(value, dict) and isinstance(overrides.get(section), dict):
+                overrides[section].update(value)
+            else:
+                overrides[section] = value
 
-    opt_threshold, final_probs = classifiers.train_hyper_optimized_model(df_agg, utils.MOD_DIR)
+    if args.training:
+        overrides["training"] = args.training
 
-    # We save to the ROOT 'top_biological_targets.csv' for the API to find easily
-    analysis.generate_discovery_report(
-        df_agg, 
-        final_probs, 
-        opt_threshold, 
-        utils.BASE_DIR / "top_biological_targets.csv"
-    )
+    print("⏳ Step 1: Loading & Mapping Data...")
+    stages = build_stages(PATHS, overrides, cpus=args.cpus, memory_mb=args.memory_mb, graph=args.graph_features)
+    run_pipeline(stages, force=args.force, from_stage=args.from_stage)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
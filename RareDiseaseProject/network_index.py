@@ -0,0 +1,171 @@
+import time
+
+import numpy as np
+
+import cache_store
+import ppi_store
+
+STORE_NAME = "ppi_network"
+ARRAYS = ['indptr', 'neighbors', 'scores', 'genes']
+# STRING's "medium confidence" cut-off
+DEFAULT_MIN_SCORE = 400
+MAX_HOPS = 2
+# combined_score is 0-1000, so it packs into 10 bits of a sort key
+SCORE_SPAN = 1024
+
+
+# Gene x gene interaction index in CSR form: the neighbours of gene i are
+# neighbors[indptr[i]:indptr[i + 1]] with their combined_score in the same slice of
+# `scores`. Each row is sorted strongest first, so the edges above a score cut-off are
+# a prefix of the row found by binary search. The arrays are memory-mapped from the
+# cache, so a query only pages in the rows it reads.
+class NetworkIndex:
+    def __init__(self, arrays):
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        self.gene_code = {}
+        for code, gene in enumerate(self.genes.tolist()):
+            self.gene_code.setdefault(gene.upper(), code)
+
+    def __len__(self):
+        return len(self.neighbors)
+
+    def code(self, symbol):
+        return self.gene_code.get(str(symbol).upper())
+
+    def _prefix_ends(self, rows, min_score):
+        # Vectorised binary search: end of the >= min_score prefix of every row at once
+        lo, hi = self.indptr[rows].copy(), self.indptr[rows + 1].copy()
+        last = max(len(self.scores) - 1, 0)
+        active = lo < hi
+        while active.any():
+            mid = (lo + hi) // 2
+            above = self.scores[np.minimum(mid, last)] >= min_score
+            lo = np.where(active & above, mid + 1, lo)
+            hi = np.where(active & ~above, mid, hi)
+            active = lo < hi
+        return lo
+
+    def _edges(self, rows, min_score):
+        # (position in rows, neighbour, score) for every edge >= min_score leaving `rows`
+        starts = self.indptr[rows]
+        lengths = self._prefix_ends(rows, min_score) - starts
+        offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        entries = offsets + np.arange(lengths.sum())
+        return np.repeat(np.arange(len(rows)), lengths), self.neighbors[entries], self.scores[entries]
+
+    def neighborhood(self, symbol, min_score=DEFAULT_MIN_SCORE, hops=1):
+        # Genes within `hops` edges of `symbol`, using only edges scoring >= min_score.
+        # A 2-hop gene is scored by its strongest path, where a path is as strong as
+        # its weakest edge; `via` is the direct neighbour on that path (-1 for hop 1).
+        code = self.code(symbol)
+        if code is None:
+            return None
+        _, first, first_scores = self._edges(np.array([code], dtype=np.int64), min_score)
+        genes, scores = [first], [first_scores.astype(np.int32)]
+        via, depth = [np.full(len(first), -1, dtype=np.int64)], [np.ones(len(first), dtype=np.int8)]
+
+        if hops >= 2 and len(first):
+            source, second, second_scores = self._edges(first.astype(np.int64), min_score)
+            origin, path_scores = first[source], np.minimum(first_scores[source], second_scores)
+            seen = np.zeros(len(self.genes), dtype=bool)
+            seen[first] = True
+            seen[code] = True
+            new = ~seen[second]
+            origin, second, path_scores = origin[new], second[new], path_scores[new]
+            # (gene, strength) packed into one int32 key: after a plain sort the first key
+            # of each gene is its strongest path. Much cheaper than argsort or ufunc.at
+            # when a hub reaches millions of edges.
+            packed = np.sort(second.astype(np.int32) * SCORE_SPAN + (SCORE_SPAN - 1 - path_scores))
+            reached = packed // SCORE_SPAN
+            head = np.ones(len(packed), dtype=bool)
+            head[1:] = reached[1:] != reached[:-1]
+            reached, reached_scores = reached[head], SCORE_SPAN - 1 - packed[head] % SCORE_SPAN
+            # The via gene is looked up among the few edges that lie on a best path
+            best = np.zeros(len(self.genes), dtype=np.int32)
+            best[reached] = reached_scores
+            on_best = np.flatnonzero(best[second] == path_scores)
+            _, pick = np.unique(second[on_best], return_index=True)
+            genes.append(reached)
+            scores.append(reached_scores)
+            via.append(origin[on_best[pick]])
+            depth.append(np.full(len(reached), 2, dtype=np.int8))
+
+        return {
+            "code": code,
+            "genes": np.concatenate(genes).astype(np.int64),
+            "scores": np.concatenate(scores),
+            "via": np.concatenate(via),
+            "hops": np.concatenate(depth),
+        }
+
+
+def build_index(edges):
+    # Collapses STRING's protein pairs onto gene symbols, keeping the strongest score of
+    # each gene pair, and stores every interaction in both directions
+    n = len(edges.genes)
+    g1 = edges.gene_codes(np.asarray(edges.protein1))
+    g2 = edges.gene_codes(np.asarray(edges.protein2))
+    keep = (g1 >= 0) & (g2 >= 0) & (g1 != g2)
+    g1, g2, score = g1[keep].astype(np.int64), g2[keep].astype(np.int64), np.asarray(edges.score)[keep]
+    rows, cols = np.concatenate([g1, g2]), np.concatenate([g2, g1])
+    score = np.concatenate([score, score]).astype(np.int16)
+
+    # (pair, strength) packed into one int64 so a plain sort does the work of a lexsort;
+    # strongest first, so the first entry of each pair holds its best score
+    weakness = SCORE_SPAN - 1 - score.astype(np.int64)
+    packed = np.sort((rows * n + cols) * SCORE_SPAN + weakness)
+    pair = packed // SCORE_SPAN
+    first = np.ones(len(packed), dtype=bool)
+    first[1:] = pair[1:] != pair[:-1]
+    pair, weakness = pair[first], packed[first] % SCORE_SPAN
+
+    # Re-pack as (row, strength, column): rows in gene order, each row strongest first
+    rows, cols = pair // n, pair % n
+    packed = np.sort((rows * SCORE_SPAN + weakness) * n + cols)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    return NetworkIndex({
+        'indptr': indptr,
+        'neighbors': (packed % n).astype(np.int32),
+        'scores': (SCORE_SPAN - 1 - (packed // n) % SCORE_SPAN).astype(np.int16),
+        'genes': np.asarray(edges.genes),
+    })
+
+
+def save_index(index, sources, cache_dir=None):
+    store = cache_store.entry_dir(STORE_NAME, cache_dir)
+    store.mkdir(parents=True, exist_ok=True)
+    cache_store.invalidate(STORE_NAME, cache_dir)
+    for name in ARRAYS:
+        cache_store.save_array(store / f"{name}.npy", getattr(index, name))
+    cache_store.write_meta(STORE_NAME, sources, cache_dir)
+
+
+def load_saved(sources, cache_dir=None, mmap_mode='r'):
+    if not cache_store.meta_is_current(STORE_NAME, sources, cache_dir):
+        return None
+    store = cache_store.entry_dir(STORE_NAME, cache_dir)
+    try:
+        return NetworkIndex({name: np.load(store / f"{name}.npy", mmap_mode=mmap_mode, allow_pickle=False)
+                             for name in ARRAYS})
+    except Exception as e:
+        print(f"⚠️ Network index cache unreadable: {e}")
+        return None
+
+
+def load_index(links_path, info_path, cache_dir=None, rebuild=False):
+    sources = [links_path, info_path]
+    # One process builds after a STRING update; other workers wait, then map its arrays
+    with cache_store.build_lock(STORE_NAME, cache_dir):
+        index = None if rebuild else load_saved(sources, cache_dir)
+        if index is not None:
+            print(f"⚡ Memory-mapped network index ({len(index):,} gene edges) from cache")
+            return index
+        print("🕸️ Building gene network index from STRING links...")
+        start = time.perf_counter()
+        index = build_index(ppi_store.load_ppi(links_path, info_path, cache_dir, rebuild=rebuild))
+        save_index(index, sources, cache_dir)
+        print(f"✅ Indexed {len(index):,} gene edges in {time.perf_counter() - start:.1f}s")
+        # Reopen memory-mapped so the built copy can be freed
+        return load_saved(sources, cache_dir) or index
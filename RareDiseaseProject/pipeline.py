@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+from pathlib import Path
+
+import cache_store
+import utils
+
+PIPELINE_DIR = "pipeline"
+OUTPUT_FILE = "output.pkl"
+MANIFEST_FILE = "manifest.json"
+FINGERPRINT_FILE = "fingerprints.json"
+# Older outputs kept per stage, so switching back to a previous input or parameter set is a cache hit
+KEEP_OUTPUTS = 3
+
+
+# One step of the training pipeline. Its cache key hashes the stage version, its parameters,
+# the content of its source files and the output digests of the stages it depends on, so a
+# stage reruns only when something it reads has changed.
+class Stage:
+    def __init__(self, name, run, deps=(), sources=(), params=None, version=1, store=True, publish=()):
+        self.name = name
+        self.run = run  # run(inputs, out_dir, params, rebuild) -> output
+        self.deps = tuple(deps)
+        self.sources = tuple(sources)
+        self.params = params or {}
+        self.version = version
+        # store=False: the stage keeps its own cache (e.g. memory-mapped arrays) and is
+        # cheap to call again, so only its key is recorded
+        self.store = store
+        # (artifact file in out_dir, destination path) copies made after the stage resolves
+        self.publish = tuple(publish)
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class SourceHashes:
+    # sha256 of source files, re-read only when size or mtime changes
+    def __init__(self, path):
+        self.path = path
+        try:
+            self.known = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.known = {}
+
+    def __call__(self, path):
+        fp = cache_store.file_fingerprint(path, with_hash=False)
+        if fp.get("missing"):
+            raise FileNotFoundError(path)
+        key = str(Path(path).resolve())
+        old = self.known.get(key)
+        if old and old["size"] == fp["size"] and old["mtime"] == fp["mtime"]:
+            return old["sha256"]
+        fp["sha256"] = cache_store.file_fingerprint(path)["sha256"]
+        self.known[key] = fp
+        return fp["sha256"]
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        cache_store.write_atomic(self.path, json.dumps(self.known, indent=2).encode("utf-8"))
+
+
+def stage_key(stage, source_hashes, dep_digests):
+    spec = {
+        "stage": stage.name,
+        "version": stage.version,
+        "params": stage.params,
+        "sources": source_hashes,
+        "deps": dep_digests,
+    }
+    return _digest(json.dumps(spec, sort_keys=True, default=str).encode("utf-8"))[:16]
+
+
+def _downstream(stages, start):
+    names = {start}
+    for stage in stages:
+        if any(dep in names for dep in stage.deps):
+            names.add(stage.name)
+    return names
+
+
+def _read_manifest(out_dir):
+    try:
+        return json.loads((out_dir / MANIFEST_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _prune(stage_dir, keep):
+    outputs = sorted((d for d in stage_dir.iterdir() if (d / MANIFEST_FILE).exists()),
+                     key=lambda d: (d / MANIFEST_FILE).stat().st_mtime, reverse=True)
+    for old in outputs[KEEP_OUTPUTS:]:
+        if old.name != keep:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def _publish(stage, out_dir):
+    for artifact, destination in stage.publish:
+        source, destination = out_dir / artifact, Path(destination)
+        if destination.exists() and destination.stat().st_size == source.stat().st_size \
+                and cache_store.file_fingerprint(destination)["sha256"] == cache_store.file_fingerprint(source)["sha256"]:
+            continue
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        tmp = destination.with_name(f"{destination.name}.{os.getpid()}.tmp")
+        shutil.copyfile(source, tmp)
+        os.replace(tmp, destination)
+
+
+def _run_stage(stage, inputs, out_dir, rebuild):
+    # Build into a scratch directory and rename it into place, so a crash never leaves
+    # a half-written output behind a valid key
+    tmp_dir = out_dir.with_name(f"{out_dir.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    output = stage.run(inputs, tmp_dir, stage.params, rebuild)
+    payload = None
+    if stage.store:
+        payload = pickle.dumps(output, protocol=pickle.HIGHEST_PROTOCOL)
+        (tmp_dir / OUTPUT_FILE).write_bytes(payload)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return output, payload
+
+
+def run_pipeline(stages, force=False, from_stage=None, cache_dir=None):
+    root = Path(cache_dir or utils.CACHE_DIR) / PIPELINE_DIR
+    names = [stage.name for stage in stages]
+    if from_stage is not None and from_stage not in names:
+        raise ValueError(f"Unknown stage {from_stage!r}; expected one of {', '.join(names)}")
+    rerun = set(names) if force else (_downstream(stages, from_stage) if from_stage else set())
+    hashes = SourceHashes(root / FINGERPRINT_FILE)
+
+    outputs, digests, report = {}, {}, []
+    for stage in stages:
+        start = time.perf_counter()
+        key = stage_key(stage, [hashes(p) for p in stage.sources], [digests[d] for d in stage.deps])
+        out_dir = root / stage.name / key
+        manifest = None if stage.name in rerun else _read_manifest(out_dir)
+        inputs = {dep: outputs[dep] for dep in stage.deps}
+
+        if manifest is not None and stage.store:
+            with open(out_dir / OUTPUT_FILE, "rb") as f:
+                outputs[stage.name] = pickle.load(f)
+            status = "cached"
+        elif manifest is not None:
+            outputs[stage.name] = stage.run(inputs, out_dir, stage.params, False)
+            status = "cached"
+        else:
+            print(f"▶️ Stage {stage.name} ({key})")
+            outputs[stage.name], payload = _run_stage(stage, inputs, out_dir, stage.name in rerun)
+            manifest = {
+                "stage": stage.name,
+                "key": key,
+                # Downstream keys use the output digest, so an input change that produces
+                # an identical output does not invalidate later stages
+                "digest": _digest(payload) if payload is not None else key,
+                "params": stage.params,
+                "deps": {dep: digests[dep] for dep in stage.deps},
+                "seconds": round(time.perf_counter() - start, 3),
+                "created": time.time(),
+            }
+            cache_store.write_atomic(out_dir / MANIFEST_FILE, json.dumps(manifest, indent=2, default=str).encode("utf-8"))
+            _prune(out_dir.parent, key)
+            status = "ran"
+
+        digests[stage.name] = manifest["digest"]
+        _publish(stage, out_dir)
+        report.append((stage.name, status, key, time.perf_counter() - start))
+
+    hashes.save()
+    print("⏱️ Pipeline stages:")
+    for name, status, key, seconds in report:
+        print(f"   {name:<10} {status:<7} {key}  {seconds:8.2f}s")
+    return outputs
@@ -0,0 +1,108 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+import cache_store
+
+STORE_NAME = "ppi_edges"
+EDGE_CHUNK_ROWS = 2_000_000
+ARRAYS = ['protein1', 'protein2', 'score', 'proteins', 'protein_gene', 'genes']
+
+
+# STRING edge list with proteins interned to int32 codes and scores stored as int16.
+# protein1/protein2 index into `proteins` (-1 for ids missing from the info file) and
+# protein_gene maps a protein code to an index into the sorted `genes` table.
+class EncodedPPI:
+    def __init__(self, arrays):
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+
+    def __len__(self):
+        return len(self.score)
+
+    def gene_codes(self, protein_codes):
+        # -1 passes through so unmapped proteins can be masked out by the caller
+        lookup = np.append(self.protein_gene, np.int32(-1))
+        return lookup[protein_codes]
+
+
+def _read_protein_table(info_path):
+    info = pd.read_csv(info_path, sep='\t', usecols=['string_protein_id', 'preferred_name'])
+    proteins = info['string_protein_id'].to_numpy(dtype=str)
+    genes = np.array(sorted(info['preferred_name'].dropna().unique()), dtype=str)
+    gene_code = {g: i for i, g in enumerate(genes)}
+    protein_gene = np.array([gene_code.get(g, -1) for g in info['preferred_name']], dtype=np.int32)
+    return proteins, protein_gene, genes
+
+
+def _encode_column(column, protein_code):
+    cat = column.cat
+    # Trailing -1 catches the -1 code pandas uses for missing ids
+    lookup = np.array([protein_code.get(p, -1) for p in cat.categories] + [-1], dtype=np.int32)
+    return lookup[cat.codes.to_numpy()]
+
+
+def encode_ppi(links_path, info_path, chunksize=EDGE_CHUNK_ROWS):
+    proteins, protein_gene, genes = _read_protein_table(info_path)
+    protein_code = {p: i for i, p in enumerate(proteins)}
+
+    p1_parts, p2_parts, score_parts = [], [], []
+    reader = pd.read_csv(links_path, sep=' ', dtype={'protein1': 'category', 'protein2': 'category',
+                                                     'combined_score': np.int16}, chunksize=chunksize)
+    for chunk in reader:
+        p1_parts.append(_encode_column(chunk['protein1'], protein_code))
+        p2_parts.append(_encode_column(chunk['protein2'], protein_code))
+        score_parts.append(chunk['combined_score'].to_numpy(dtype=np.int16))
+
+    empty = np.array([], dtype=np.int32)
+    return EncodedPPI({
+        'protein1': np.concatenate(p1_parts) if p1_parts else empty,
+        'protein2': np.concatenate(p2_parts) if p2_parts else empty,
+        'score': np.concatenate(score_parts) if score_parts else empty.astype(np.int16),
+        'proteins': proteins,
+        'protein_gene': protein_gene,
+        'genes': genes,
+    })
+
+
+def save_encoded(encoded, sources, cache_dir=None):
+    store = cache_store.entry_dir(STORE_NAME, cache_dir)
+    store.mkdir(parents=True, exist_ok=True)
+    cache_store.invalidate(STORE_NAME, cache_dir)
+    for name in ARRAYS:
+        cache_store.save_array(store / f"{name}.npy", getattr(encoded, name))
+    cache_store.write_meta(STORE_NAME, sources, cache_dir)
+
+
+def load_encoded(sources, cache_dir=None, mmap_mode='r'):
+    if not cache_store.meta_is_current(STORE_NAME, sources, cache_dir):
+        return None
+    store = cache_store.entry_dir(STORE_NAME, cache_dir)
+    try:
+        return EncodedPPI({name: np.load(store / f"{name}.npy", mmap_mode=mmap_mode, allow_pickle=False)
+                           for name in ARRAYS})
+    except Exception as e:
+        print(f"⚠️ Encoded PPI cache unreadable: {e}")
+        return None
+
+
+def load_ppi(links_path, info_path, cache_dir=None, rebuild=False):
+    sources = [links_path, info_path]
+    encoded = None if rebuild else load_encoded(sources, cache_dir)
+    if encoded is not None:
+        print(f"⚡ Memory-mapped {len(encoded):,} encoded PPI edges from cache")
+        return encoded
+    # On a miss one process encodes; the others wait, then find its arrays on the re-check
+    with cache_store.build_lock(STORE_NAME, cache_dir):
+        encoded = None if rebuild else load_encoded(sources, cache_dir)
+        if encoded is not None:
+            print(f"⚡ Memory-mapped {len(encoded):,} encoded PPI edges from cache")
+            return encoded
+        print("🧬 Encoding STRING links to integer protein codes...")
+        start = time.perf_counter()
+        encoded = encode_ppi(links_path, info_path)
+        save_encoded(encoded, sources, cache_dir)
+        print(f"✅ Encoded {len(encoded):,} edges in {time.perf_counter() - start:.1f}s")
+        # Reopen memory-mapped so callers never hold a second private copy of the arrays
+        return load_encoded(sources, cache_dir) or encoded
@@ -1,10 +1,12 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent
 DATA_DIR = BASE_DIR / "datasets"
 MOD_DIR = BASE_DIR / "models"
 OUT_DIR = BASE_DIR / "cleaned"
+CACHE_DIR = Path(os.getenv("DISCOVERY_CACHE_DIR", BASE_DIR / "cache"))
 
 def ensure_directories():
-    for d in [DATA_DIR, MOD_DIR, OUT_DIR]:
-        d.mkdir(exist_ok=True)
\ No newline at end of file
+    for d in [DATA_DIR, MOD_DIR, OUT_DIR, CACHE_DIR]:
+        d.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,369 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from pathlib import Path
+from types import SimpleNamespace
+
+from groq import AsyncGroq
+
+import metrics
+
+ADVICE_MODEL = "llama-3.3-70b-versatile"
+FALLBACK_ADVICE = "AI Analysis: {symbol} shows significant topological relevance in protein networks."
+CAPACITY_ADVICE = "Insight generation currently at capacity."
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def build_prompt(data):
+    return f"""
+        System: You are a Bioinformatics Research Assistant.
+        Context: Analyzing rare disease gene lead {data['symbol']}.
+        Metrics:
+        - Discovery Score: {data['score']}
+        - Network Centrality: {data['xai']['Network Centrality']}
+        - Interaction Skewness: {data['xai']['Interaction Skewness']}
+        Task: Provide a 2-sentence clinical summary. Explain how these topological
+        metrics suggest biological importance and name a potential drug category.
+        """
+
+
+def advice_key(data):
+    # Advice is tied to the metrics it was written from, so a retrained score misses the cache
+    metrics = json.dumps({"score": data['score'], "xai": data['xai']}, sort_keys=True, default=float)
+    return f"{data['symbol'].upper()}:{hashlib.sha1(metrics.encode('utf-8')).hexdigest()[:16]}"
+
+
+class AdviceCache:
+    # SQLite-backed TTL + LRU cache shared by every worker process on the host
+    def __init__(self, path, ttl_seconds, max_entries):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS advice ("
+                "key TEXT PRIMARY KEY, symbol TEXT, advice TEXT, created REAL, accessed REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS advice_accessed ON advice(accessed)")
+            conn.commit()
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key):
+        try:
+            conn = self._conn()
+            row = conn.execute("SELECT advice, created FROM advice WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                metrics.ADVICE_CACHE.inc(result="miss")
+                return None
+            now = time.time()
+            if now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM advice WHERE key = ?", (key,))
+                conn.commit()
+                metrics.ADVICE_CACHE.inc(result="expired")
+                return None
+            conn.execute("UPDATE advice SET accessed = ? WHERE key = ?", (now, key))
+            conn.commit()
+            metrics.ADVICE_CACHE.inc(result="hit")
+            return row[0]
+        except sqlite3.Error as e:
+            print(f"⚠️ Advice cache read failed: {e}")
+            metrics.ADVICE_CACHE.inc(result="error")
+            return None
+
+    def put(self, key, symbol, advice):
+        try:
+            conn = self._conn()
+            now = time.time()
+            conn.execute("INSERT OR REPLACE INTO advice VALUES (?, ?, ?, ?, ?)", (key, symbol, advice, now, now))
+            conn.execute(
+                "DELETE FROM advice WHERE key IN ("
+                "SELECT key FROM advice ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️ Advice cache write failed: {e}")
+
+
+class TokenBucket:
+    def __init__(self, rate_per_sec, capacity):
+        self.rate = rate_per_sec
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AdviceService:
+    def __init__(self, cache_path, api_key=None, base_url=None, client=None,
+                 max_concurrency=None, rate_per_sec=None, max_retries=5,
+                 backoff_base=0.5, backoff_cap=20.0, timeout=None, request_timeout=None,
+                 ttl_seconds=None, max_entries=None):
+        self.api_key = api_key or os.getenv("GROQ_API_KEY")
+        # GROQ_BASE_URL lets tests and local runs point the client at a stub server
+        self.base_url = base_url or os.getenv("GROQ_BASE_URL")
+        self.max_concurrency = max_concurrency or int(os.getenv("ADVICE_MAX_CONCURRENCY", 4))
+        self.rate_per_sec = rate_per_sec or float(os.getenv("ADVICE_RATE_PER_SEC", 0.5))
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.timeout = timeout or float(os.getenv("ADVICE_TIMEOUT", 60))
+        # Longest a request thread waits for advice; retries and backoff can take minutes,
+        # so the call carries on in the background and lands in the cache when it finishes
+        self.request_timeout = request_timeout if request_timeout is not None else float(
+            os.getenv("ADVICE_REQUEST_TIMEOUT", 5))
+        self.cache = AdviceCache(
+            cache_path,
+            ttl_seconds=ttl_seconds or float(os.getenv("ADVICE_CACHE_TTL", 30 * 24 * 3600)),
+            max_entries=max_entries or int(os.getenv("ADVICE_CACHE_MAX_ENTRIES", 50_000)),
+        )
+        self._client = client
+        self._client_injected = client is not None
+        self._inflight = {}
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._semaphore = None
+        self._bucket = None
+        self._loop = None
+        self._loop_pid = None
+        self._loop_lock = threading.Lock()
+
+    # --- event loop plumbing -------------------------------------------------
+    def _ensure_loop(self):
+        # The loop thread does not survive fork, so each worker process starts its own
+        with self._loop_lock:
+            if self._loop is None or self._loop_pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="advice-loop", daemon=True).start()
+                self._loop, self._loop_pid = loop, os.getpid()
+                self._inflight = {}
+                self._pending = {}
+                self._semaphore = None
+                self._bucket = None
+                if not self._client_injected:
+                    # The HTTP client is bound to the loop it was first used on
+                    self._client = None
+            return self._loop
+
+    def _loop_state(self):
+        # asyncio primitives must be created on the loop that uses them
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._bucket = TokenBucket(self.rate_per_sec, capacity=max(1, self.max_concurrency))
+        return self._semaphore, self._bucket
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = AsyncGroq(api_key=self.api_key, base_url=self.base_url,
+                                     timeout=self.timeout, max_retries=0)
+        return self._client
+
+    # --- async core ------------------------------------------------------------
+    async def _call_llm(self, data):
+        semaphore, bucket = self._loop_state()
+        prompt = build_prompt(data)
+        for attempt in range(self.max_retries):
+            start = None
+            try:
+                async with semaphore:
+                    await bucket.acquire()
+                    # Timed from after the rate limiter, so this is the Groq round trip alone
+                    start = time.perf_counter()
+                    completion = await self._get_client().chat.completions.create(
+                        model=ADVICE_MODEL,
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=0.3,
+                        max_tokens=150
+                    )
+                    metrics.LLM_SECONDS.observe(time.perf_counter() - start, outcome="ok")
+                return completion.choices[0].message.content, True
+            except Exception as e:
+                status = getattr(e, "status_code", None)
+                retryable = status in RETRYABLE_STATUS or "429" in str(e) or type(e).__name__ in (
+                    "APIConnectionError", "APITimeoutError")
+                if start is not None:
+                    metrics.LLM_SECONDS.observe(time.perf_counter() - start,
+                                                outcome="retryable_error" if retryable else "error")
+                if not retryable:
+                    return FALLBACK_ADVICE.format(symbol=data['symbol']), False
+                # Full jitter keeps concurrent retries from re-synchronising on the rate limit
+                await asyncio.sleep(random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt)))
+        return CAPACITY_ADVICE, False
+
+    async def _generate(self, data):
+        # SQLite calls run on the default executor: a slow read or a locked database must
+        # not stall the loop that every request thread shares
+        loop = asyncio.get_running_loop()
+        key = advice_key(data)
+        cached = await loop.run_in_executor(None, self.cache.get, key)
+        if cached is not None:
+            return cached
+        task = self._inflight.get(key)
+        if task is None:
+            # Concurrent requests for the same gene and metrics share one in-flight call
+            task = asyncio.ensure_future(self._call_llm(data))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            advice, ok = await asyncio.shield(task)
+            if ok:
+                await loop.run_in_executor(None, self.cache.put, key, data['symbol'], advice)
+            return advice
+        advice, _ = await asyncio.shield(task)
+        return advice
+
+    # --- sync API for Flask threads ------------------------------------------
+    def submit(self, data):
+        return asyncio.run_coroutine_threadsafe(self._generate(data), self._ensure_loop())
+
+    def get_advice(self, data, timeout=None):
+        cached = self.cache.get(advice_key(data))
+        if cached is not None:
+            return cached
+        try:
+            return self.submit(data).result(timeout=self.request_timeout if timeout is None else timeout)
+        except Exception:
+            return CAPACITY_ADVICE
+
+    def start(self, data):
+        # Background generation for pollers; a second caller gets the same pending future.
+        # The entry is dropped as soon as the call finishes: a good answer is in the cache by
+        # then, and a fallback is retried by the next poll instead of being held until exit.
+        self._ensure_loop()
+        key = advice_key(data)
+        with self._pending_lock:
+            future = self._pending.get(key)
+            started = future is None
+            if started:
+                future = self.submit(data)
+                self._pending[key] = future
+        if started:
+            # Outside the lock: the callback runs right here if the call has already finished
+            future.add_done_callback(lambda done: self._drop_pending(key, done))
+        return key, future
+
+    def _drop_pending(self, key, future):
+        with self._pending_lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+    def poll(self, data, wait=0.0):
+        # Returns ("ready", advice) or ("pending", None), starting generation if needed
+        cached = self.cache.get(advice_key(data))
+        if cached is not None:
+            return "ready", cached
+        _, future = self.start(data)
+        if wait <= 0 and not future.done():
+            return "pending", None
+        try:
+            advice = future.result(timeout=wait if wait > 0 else None)
+        except FutureTimeout:
+            return "pending", None
+        except Exception:
+            advice = CAPACITY_ADVICE
+        return "ready", advice
+
+    def prewarm(self, items):
+        async def _run():
+            return await asyncio.gather(*(self._generate(data) for data in items))
+        return asyncio.run_coroutine_threadsafe(_run(), self._ensure_loop()).result()
+
+
+class StubRateLimited(Exception):
+    status_code = 429
+
+
+class StubClient:
+    # Stand-in for AsyncGroq: chat.completions.create waits `latency` seconds, answers the
+    # first `fail_first` calls with a 429, then returns a completion
+    def __init__(self, latency=0.05, fail_first=1):
+        self.latency = latency
+        self.fail_first = fail_first
+        self.calls = 0
+        self.rate_limited = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.calls <= self.fail_first:
+            self.rate_limited += 1
+            raise StubRateLimited("429 Too Many Requests")
+        message = SimpleNamespace(content=f"Stub advice #{self.calls}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def self_check(concurrency=8):
+    # Runs the service against StubClient: concurrent callers share one call, a 429 is
+    # retried, a repeat is a cache hit, and a slow call is cut off at the request timeout
+    # but still finishes in the background without leaving a pending entry
+    def gene(symbol):
+        return {"symbol": symbol, "score": 0.9, "xai": {"Network Centrality": 3, "Interaction Skewness": 0.1}}
+
+    def cache_hits():
+        return metrics.ADVICE_CACHE.snapshot().get(("hit",), 0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stub = StubClient()
+        service = AdviceService(Path(tmp) / "advice.sqlite3", client=stub, rate_per_sec=100,
+                                backoff_base=0.01, backoff_cap=0.05, request_timeout=5)
+        with ThreadPoolExecutor(concurrency) as pool:
+            answers = list(pool.map(lambda _: service.get_advice(gene("STUB1")), range(concurrency)))
+        checks = {
+            "coalesced": len(set(answers)) == 1 and stub.calls == 2,
+            "retried_429": stub.rate_limited == 1 and answers[0] != CAPACITY_ADVICE,
+        }
+        hits = cache_hits()
+        checks["cache_hit"] = service.get_advice(gene("STUB1")) == answers[0] and stub.calls == 2 \
+            and cache_hits() == hits + 1
+
+        stub.latency = 1.0
+        start = time.perf_counter()
+        cut_off = service.get_advice(gene("STUB2"), timeout=0.2)
+        checks["request_timeout"] = cut_off == CAPACITY_ADVICE and time.perf_counter() - start < 0.9
+        status, advice = service.poll(gene("STUB2"), wait=5)
+        checks["finished_in_background"] = status == "ready" and advice not in (None, CAPACITY_ADVICE) \
+            and stub.calls == 3
+        # Finished polls leave nothing behind; done-callbacks run just after result() wakes
+        deadline = time.perf_counter() + 1
+        while service._pending and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        checks["pending_released"] = not service._pending
+    return checks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Advice service maintenance commands")
+    parser.add_argument("--self-check", action="store_true", help="exercise coalescing, 429 backoff and the cache against a stub client")
+    args = parser.parse_args()
+    if args.self_check:
+        checks = self_check()
+        print(f"🔎 {checks}")
+        raise SystemExit(0 if all(checks.values()) else 1)
+    parser.print_help()
@@ -1,23 +1,130 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, g, request, jsonify, render_template, url_for
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-from inference_engine import DiscoveryEngine
+from inference_engine import DiscoveryEngine, source_fingerprints
+from network_index import DEFAULT_MIN_SCORE, MAX_HOPS
+from response_cache import ResponseCache
+from scoring import ScoringError
+import cache_store
+import metrics
+import utils
+import json
 import logging
 import platform
 import os
+import sys
+import threading
+import time
+import uuid
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MAX_PAGE_SIZE = 500
+MAX_SCORE_ITEMS = 1000
+NETWORK_RANKS = ("combined", "discovery")
+NETWORK_FILTERS = ("disease", "drug")
+SSE_KEEPALIVE_SECONDS = 15
+SSE_MAX_WAIT_SECONDS = 120
+# Hot reload: data files are polled every DATA_WATCH_SECONDS (0 disables the scan).
+# POST /api/admin/reload needs ADMIN_TOKEN in ADMIN_HEADER; it writes RELOAD_TRIGGER,
+# which the watcher of every worker checks each RELOAD_POLL_SECONDS.
+DATA_WATCH_SECONDS = float(os.getenv("DATA_WATCH_SECONDS", 30))
+RELOAD_POLL_SECONDS = float(os.getenv("RELOAD_POLL_SECONDS", 2))
+RELOAD_TRIGGER = utils.CACHE_DIR / "reload.trigger"
+ADMIN_HEADER = "X-Admin-Token"
+
+PROFILE_DIR = utils.CACHE_DIR / "profiles"
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    # jsonify() and the response cache both serialise through app.json, so this sees every body
+    def dumps(self, obj, **kwargs):
+        with metrics.JSON_SECONDS.time():
+            body = super().dumps(obj, **kwargs)
+        metrics.JSON_BYTES.inc(len(body))
+        return body
+
+
 app = Flask(__name__)
+app.json = TimedJSONProvider(app)
 CORS(app)
+response_cache = ResponseCache()
 
-# Initialize Discovery Engine
+# Discovery Engine is created by load_engine() at the bottom of this module and replaced
+# by reload_engine(); requests read it once, through g.engine
 engine = None
-try:
-    engine = DiscoveryEngine()
-    logger.info(f"Engine Online. Running on: {platform.system()}")
-except Exception as e:
-    logger.error(f"Startup Failure: {e}")
+engine_state = {"status": "loading", "load_seconds": None, "error": None}
+reload_lock = threading.Lock()
+reload_state = {"status": "idle", "reloads": 0, "parts": [], "seconds": None, "error": None, "finished": None,
+                "trigger": None}
+# Set by start_data_watcher() in each process that runs a watcher thread
+data_watcher = None
+
+
+def _int_arg(name, default, lower, upper):
+    try:
+        value = int(request.args.get(name, default))
+    except (TypeError, ValueError):
+        return default
+    if lower is not None:
+        value = max(lower, value)
+    if upper is not None:
+        value = min(upper, value)
+    return value
+
+
+@app.before_request
+def bind_engine():
+    # One engine per request: a reload swapping the global mid-request cannot mix data versions
+    g.engine = engine
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    if metrics.profile_requested(request.headers):
+        g.profiler = metrics.SamplingProfiler().start()
+
+
+@app.after_request
+def record_request(response):
+    # Streaming responses (SSE) are timed up to their headers, not until the stream closes
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    metrics.HTTP_SECONDS.observe(time.perf_counter() - g.request_start,
+                                 route=route, method=request.method, status=response.status_code)
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.stop()
+        profile_id = metrics.save_profile(profiler, PROFILE_DIR, f"{request.method} {request.full_path}")
+        response.headers["X-Profile-Id"] = profile_id
+        response.headers["X-Profile-Samples"] = str(profiler.samples)
+        response.headers["X-Profile-Url"] = url_for('profile', profile_id=profile_id)
+    return response
+
+
+@app.teardown_request
+def stop_profiler(exc):
+    # Requests that raised never reach after_request; do not leave the sampler running
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.stop()
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route('/debug/profile/<profile_id>', methods=['GET'])
+def profile(profile_id):
+    # Collapsed stacks (flamegraph.pl / speedscope input) of a request sent with X-Profile
+    if not metrics.profile_requested(request.headers):
+        return jsonify({"error": "Profiling disabled"}), 404
+    text = metrics.load_profile(PROFILE_DIR, profile_id)
+    if text is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return Response(text, mimetype="text/plain")
 
 
 @app.route('/', methods=['GET'])
@@ -27,23 +134,36 @@ def home():
 
 @app.route('/api/dashboard/genes', methods=['GET'])
 def top_genes():
-    if not engine:
+    if not g.engine:
         return jsonify({"error": "Engine Offline"}), 500
-    return jsonify(engine.get_top_10_genes())
+    return response_cache.respond("dashboard_genes", g.engine.data_version, g.engine.data_modified,
+                                  g.engine.get_top_10_genes)
 
 
 @app.route('/api/search', methods=['GET'])
 def search():
     gene = request.args.get('gene')
     disease = request.args.get('disease')
-    if not engine: return jsonify({"error": "Engine Offline"}), 500
+    drug = request.args.get('drug')
+    if not g.engine: return jsonify({"error": "Engine Offline"}), 500
 
     try:
         if gene:
-            return jsonify(engine.search_by_gene(gene))
+            result = g.engine.search_by_gene(gene, defer_advice=request.args.get('advice') == 'defer')
+            if result.get("advice_status") == "pending":
+                result["advice_url"] = url_for('advice', gene=gene)
+                result["advice_stream_url"] = url_for('advice_stream', gene=gene)
+            return jsonify(result)
 
         if disease:
-            return jsonify(engine.search_by_disease(disease))
+            limit = _int_arg('limit', None, 1, MAX_PAGE_SIZE)
+            offset = _int_arg('offset', 0, 0, None)
+            return jsonify(g.engine.search_by_disease(disease, limit=limit, offset=offset))
+
+        if drug:
+            limit = _int_arg('limit', None, 1, MAX_PAGE_SIZE)
+            offset = _int_arg('offset', 0, 0, None)
+            return jsonify(g.engine.search_by_drug(drug, limit=limit, offset=offset))
 
     except Exception as e:
         return jsonify({"error": "Processing error", "details": str(e)}), 500
@@ -51,45 +171,135 @@ def search():
     return jsonify({"error": "No query provided"}), 400
 
 
+@app.route('/api/advice', methods=['GET'])
+def advice():
+    gene = request.args.get('gene')
+    if not gene:
+        return jsonify({"error": "Gene symbol required"}), 400
+    if not g.engine:
+        return jsonify({"error": "Engine Offline"}), 500
+    try:
+        wait = min(max(float(request.args.get('wait', 0)), 0.0), 30.0)
+    except ValueError:
+        wait = 0.0
+
+    result = g.engine.get_advice_status(gene, wait=wait)
+    if "error" in result:
+        return jsonify(result), 404
+    return jsonify(result), (202 if result["advice_status"] == "pending" else 200)
+
+
+@app.route('/api/advice/stream', methods=['GET'])
+def advice_stream():
+    gene = request.args.get('gene')
+    if not gene:
+        return jsonify({"error": "Gene symbol required"}), 400
+    if not g.engine:
+        return jsonify({"error": "Engine Offline"}), 500
+    # The generator outlives the request context, so it keeps its own reference
+    current = g.engine
+
+    def events():
+        deadline = time.monotonic() + SSE_MAX_WAIT_SECONDS
+        result = current.get_advice_status(gene)
+        while "error" not in result and result["advice_status"] == "pending" and time.monotonic() < deadline:
+            # SSE comment lines keep proxies from closing an idle stream
+            yield ": keepalive\n\n"
+            result = current.get_advice_status(gene, wait=SSE_KEEPALIVE_SECONDS)
+        event = "error" if "error" in result else ("advice" if result["advice_status"] == "ready" else "timeout")
+        yield f"event: {event}\ndata: {json.dumps(result)}\n\n"
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/score', methods=['POST'])
+def score():
+    if not g.engine:
+        return jsonify({"error": "Engine Offline"}), 500
+    body = request.get_json(silent=True) or {}
+    items = body.get("genes") if isinstance(body, dict) else None
+    if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+        return jsonify({"error": "Body must be {\"genes\": [{...}, ...]}"}), 400
+    if len(items) > MAX_SCORE_ITEMS:
+        return jsonify({"error": f"At most {MAX_SCORE_ITEMS} genes per request"}), 413
+
+    try:
+        return jsonify(g.engine.score_genes(items))
+    except ScoringError as e:
+        return jsonify({"error": "Invalid scoring input", "details": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": "Scoring unavailable", "details": str(e)}), 503
+
+
+@app.route('/api/score/stats', methods=['GET'])
+def score_stats():
+    if not g.engine:
+        return jsonify({"error": "Engine Offline"}), 500
+    return jsonify(g.engine.scoring.status())
+
+
+@app.route('/api/network', methods=['GET'])
+def network():
+    gene = request.args.get('gene')
+    if not gene:
+        return jsonify({"error": "Gene symbol required"}), 400
+    if not g.engine:
+        return jsonify({"error": "Engine Offline"}), 500
+    if g.engine.network is None:
+        return jsonify({"error": "Network index unavailable"}), 503
+    rank = request.args.get('rank', 'combined')
+    only = request.args.get('only') or None
+    if rank not in NETWORK_RANKS or (only is not None and only not in NETWORK_FILTERS):
+        return jsonify({"error": f"rank must be one of {NETWORK_RANKS}; only one of {NETWORK_FILTERS}"}), 400
+
+    result = g.engine.get_network(gene,
+                                min_score=_int_arg('min_score', DEFAULT_MIN_SCORE, 0, 1000),
+                                hops=_int_arg('hops', 1, 1, MAX_HOPS),
+                                limit=_int_arg('limit', 50, 1, MAX_PAGE_SIZE),
+                                rank=rank, only=only)
+    if "error" in result:
+        return jsonify(result), 404
+    return jsonify(result)
+
+
 @app.route('/api/status', methods=['GET'])
 def status():
     return jsonify({
         "status": "online",
         "gen_ai": "Llama-3.3-70B (Groq LPU)",
         "platform": platform.system(),
-        "engine_ready": engine is not None
+        "engine_ready": g.engine is not None
     })
 
 
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    # Readiness probe: 503 until the engine and its caches are loaded
+    body = {"ready": engine_state["status"] == "ready", "pid": os.getpid(), **engine_state,
+            "data_version": g.engine.data_version if g.engine else None, "reload": reload_state}
+    return jsonify(body), (200 if body["ready"] else 503)
+
+
 @app.route('/api/explain', methods=['GET'])
 def explain():
     gene = request.args.get('gene')
     if not gene:
         return jsonify({"error": "Gene symbol required"}), 400
-    if not engine:
+    if not g.engine:
         return jsonify({"error": "Engine Offline"}), 500
-    return jsonify(engine.get_explanation(gene))
+    return jsonify(g.engine.get_explanation(gene))
 
 
 @app.route('/api/diseases', methods=['GET'])
 def diseases():
-    if not engine:
+    if not g.engine:
         return jsonify({"error": "Engine Offline"}), 500
 
     suggest = (request.args.get('suggest') or '').strip().lower()
-    try:
-        limit = int(request.args.get('limit', 20))
-    except ValueError:
-        limit = 20
-    limit = max(1, min(limit, 100))
-
-    all_diseases = list(engine.disease_map.keys())
-    if suggest:
-        matches = [d for d in all_diseases if suggest in d.lower()]
-    else:
-        matches = all_diseases
+    limit = _int_arg('limit', 20, 1, 100)
 
-    matches = sorted(matches)[:limit]
+    matches = g.engine.disease_index.suggest(suggest, limit)
     return jsonify({
         "count": len(matches),
         "suggest": suggest,
@@ -97,40 +307,208 @@ def diseases():
     })
 
 
+def _build_gallery(engine):
+    top_genes = engine.get_top_10_genes()
+    disease_map = engine.disease_map
+    # Largest disorders by gene count, straight off the CSR offsets
+    disease_cards = [
+        {
+            "disease": disease_name,
+            "gene_count": disease_map.count(disease_name),
+            "sample_genes": disease_map.get(disease_name, limit=5),
+        }
+        for disease_name in disease_map.largest(20)
+    ]
+
+    return {
+        "genes": top_genes,
+        "diseases": disease_cards,
+        "gene_count": len(top_genes),
+        "disease_count": len(disease_cards),
+    }
+
+
 @app.route('/api/gallery', methods=['GET'])
 def gallery():
-    if not engine:
+    if not g.engine:
         return jsonify({"error": "Engine Offline"}), 500
 
     try:
-        top_genes = engine.get_top_10_genes()
-        disease_cards = []
-
-        for disease_name, genes in engine.disease_map.items():
-            safe_genes = genes or []
-            disease_cards.append({
-                "disease": disease_name,
-                "gene_count": len(safe_genes),
-                "sample_genes": safe_genes[:5],
-            })
-
-        disease_cards = sorted(
-            disease_cards,
-            key=lambda item: item["gene_count"],
-            reverse=True,
-        )[:20]
-
-        return jsonify({
-            "genes": top_genes,
-            "diseases": disease_cards,
-            "gene_count": len(top_genes),
-            "disease_count": len(disease_cards),
-        })
+        return response_cache.respond("gallery", g.engine.data_version, g.engine.data_modified,
+                                      lambda: _build_gallery(g.engine))
     except Exception as e:
         return jsonify({"error": "Failed to load gallery", "details": str(e)}), 500
 
 
+def warm_response_cache(engine):
+    # Serialize the homepage payloads up front so the first visitor is served from cache
+    with app.app_context():
+        response_cache.entry("dashboard_genes", engine.data_version, engine.get_top_10_genes)
+        response_cache.entry("gallery", engine.data_version, lambda: _build_gallery(engine))
+
+
+def load_engine():
+    global engine
+    start = time.perf_counter()
+    try:
+        loaded = DiscoveryEngine()
+    except Exception as e:
+        logger.error(f"Startup Failure: {e}")
+        engine_state.update(status="failed", error=str(e))
+        return
+    engine = loaded
+    metrics.STARTUP_SECONDS.set(round(time.perf_counter() - start, 6), phase="engine")
+    # MODEL_LOAD=eager|background loads the scoring models at startup instead of on first use
+    model_load = os.getenv("MODEL_LOAD", "lazy")
+    if model_load in ("eager", "background"):
+        with metrics.STARTUP_SECONDS.time(phase="model_preload"):
+            engine.scoring.preload(background=model_load == "background")
+    try:
+        with metrics.STARTUP_SECONDS.time(phase="response_cache_warmup"):
+            warm_response_cache(engine)
+    except Exception as e:
+        logger.error(f"Response cache warm-up failed: {e}")
+    engine_state.update(status="ready", load_seconds=round(time.perf_counter() - start, 3))
+    metrics.STARTUP_SECONDS.set(engine_state["load_seconds"], phase="total")
+    logger.info(f"Engine Online. Running on: {platform.system()}")
+
+
+def reload_engine(force=False, wait=False):
+    # Builds a new engine beside the live one, reusing the parts whose files have not
+    # changed, then swaps the global reference. Requests already running finish on the
+    # engine they started with; a failed build leaves the live engine serving.
+    # wait=True queues behind a running reload instead of skipping.
+    global engine
+    if engine is None or not reload_lock.acquire(blocking=wait):
+        return False
+    try:
+        current = engine
+        if not force and not current.changed_parts():
+            metrics.DATA_RELOADS.inc(result="unchanged")
+            return False
+        reload_state.update(status="reloading", error=None)
+        start = time.perf_counter()
+        try:
+            loaded = DiscoveryEngine(previous=current, force=force)
+        except Exception as e:
+            logger.error(f"Data reload failed, still serving {current.data_version}: {e}")
+            reload_state.update(status="failed", error=str(e))
+            metrics.DATA_RELOADS.inc(result="failed")
+            return False
+        if "models" in loaded.reloaded_parts and os.getenv("MODEL_LOAD", "lazy") in ("eager", "background"):
+            # Already off the request path, so load the new models before the swap
+            with metrics.RELOAD_SECONDS.time(phase="model_preload"):
+                loaded.scoring.preload()
+        engine = loaded
+        try:
+            with metrics.RELOAD_SECONDS.time(phase="response_cache_warmup"):
+                warm_response_cache(loaded)
+        except Exception as e:
+            logger.error(f"Response cache warm-up failed: {e}")
+        seconds = round(time.perf_counter() - start, 3)
+        metrics.RELOAD_SECONDS.set(seconds, phase="total")
+        metrics.DATA_RELOADS.inc(result="ok")
+        reload_state.update(status="idle", reloads=reload_state["reloads"] + 1, parts=loaded.reloaded_parts,
+                            seconds=seconds, finished=time.time())
+        logger.info(f"Data reloaded ({', '.join(loaded.reloaded_parts)}) in {seconds}s: "
+                    f"{current.data_version} -> {loaded.data_version}")
+        return True
+    finally:
+        reload_lock.release()
+
+
+def read_trigger():
+    # The last reload requested through the admin endpoint, by any worker
+    try:
+        return json.loads(RELOAD_TRIGGER.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def watch_data(interval):
+    # Every RELOAD_POLL_SECONDS, applies a new admin trigger that was requested after the
+    # live engine started loading; a worker forked later from the master's engine still
+    # catches up on it. Every `interval` seconds (when > 0), polls size/mtime of the data
+    # files. A change must hold still for one more scan before reloading, so a results
+    # CSV that main.py is still writing is not read half-done.
+    seen, pending = None, None
+    next_scan = time.monotonic() + interval
+    while True:
+        time.sleep(RELOAD_POLL_SECONDS)
+        current = engine
+        if current is None:
+            continue
+        trigger = read_trigger()
+        if trigger and trigger.get("id") != seen:
+            seen = trigger.get("id")
+            if trigger.get("requested", 0) > current.loaded_at:
+                reload_state.update(trigger=seen)
+                reload_engine(force=bool(trigger.get("force")), wait=True)
+                continue
+        if interval <= 0 or time.monotonic() < next_scan:
+            continue
+        next_scan = time.monotonic() + interval
+        sources = source_fingerprints()
+        if not current.changed_parts(sources):
+            pending = None
+        elif sources == pending:
+            reload_engine()
+            pending = None
+        else:
+            pending = sources
+
+
+def start_data_watcher():
+    # Threads do not survive fork: gunicorn's post_fork hook calls this in every worker.
+    # The thread always runs, so admin triggers reach workers with DATA_WATCH_SECONDS=0.
+    global data_watcher
+    data_watcher = threading.Thread(target=watch_data, args=(DATA_WATCH_SECONDS,), name="data-watcher",
+                                    daemon=True)
+    data_watcher.start()
+
+
+@app.route('/api/admin/reload', methods=['GET', 'POST'])
+def admin_reload():
+    # POST requests a reload (?force=1 reloads every part from the caches, without rebuilding
+    # them); GET reports this worker's last one.
+    # Each gunicorn worker holds its own engine, so the request goes through RELOAD_TRIGGER,
+    # which every worker's watcher picks up within RELOAD_POLL_SECONDS.
+    token = os.getenv("ADMIN_TOKEN")
+    if not token or request.headers.get(ADMIN_HEADER) != token:
+        return jsonify({"error": "Not found"}), 404
+    if request.method == 'GET':
+        return jsonify({"data_version": g.engine.data_version if g.engine else None, **reload_state})
+    if not g.engine:
+        return jsonify({"error": "Engine Offline"}), 500
+    if reload_lock.locked():
+        return jsonify({"error": "Reload already running", **reload_state}), 409
+    force = request.args.get('force') == '1'
+    trigger = {"id": uuid.uuid4().hex, "force": force, "requested": time.time()}
+    RELOAD_TRIGGER.parent.mkdir(parents=True, exist_ok=True)
+    cache_store.write_atomic(RELOAD_TRIGGER, json.dumps(trigger).encode("utf-8"))
+    if data_watcher is None:
+        # No watcher in this process (e.g. the app imported without start_data_watcher)
+        reload_state.update(trigger=trigger["id"])
+        threading.Thread(target=reload_engine, kwargs={"force": force}, name="data-reload", daemon=True).start()
+    return jsonify({"status": "reloading", "trigger": trigger["id"], "data_version": g.engine.data_version}), 202
+
+
+# Under gunicorn (preload_app) this runs once in the master and workers inherit the
+# loaded engine copy-on-write. ENGINE_BACKGROUND_LOAD=1 serves /api/ready while loading,
+# on the dev server only: under gunicorn the loader thread would stay behind in the master
+# and every forked worker would be left without an engine.
+background_load = os.getenv("ENGINE_BACKGROUND_LOAD") == "1"
+if background_load and "gunicorn" in sys.modules:
+    logger.warning("ENGINE_BACKGROUND_LOAD is ignored under gunicorn; loading the engine before forking")
+    background_load = False
+if background_load:
+    threading.Thread(target=load_engine, name="engine-loader", daemon=True).start()
+else:
+    load_engine()
+
+
 if __name__ == '__main__':
+    start_data_watcher()
     host = os.getenv('FLASK_HOST', '127.0.0.1')
     port = int(os.getenv('FLASK_PORT', '8000'))
     app.run(debug=True, host=host, port=port)
\ No newline at end of file
@@ -0,0 +1,23 @@
+import resource
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+PROJECT_DIR = ROOT_DIR / "RareDiseaseProject"
+
+# Benchmarks import the training modules the same way main.py does
+if str(PROJECT_DIR) not in sys.path:
+    sys.path.insert(0, str(PROJECT_DIR))
+
+
+def peak_rss_mb():
+    # VmHWM belongs to the current address space. ru_maxrss survives fork+exec on Linux,
+    # so a spawned worker would otherwise report its parent's peak.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
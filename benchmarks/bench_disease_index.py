@@ -0,0 +1,100 @@
+import argparse
+import json
+import random
+import statistics
+import time
+
+from benchmarks import ROOT_DIR  # noqa: F401  (puts the repo modules on sys.path)
+from disease_index import DiseaseIndex
+
+SYLLABLES = ["ab", "ac", "ad", "al", "an", "ar", "as", "at", "bo", "ca", "ce", "co", "da", "de", "di",
+             "do", "er", "fa", "ga", "ge", "gi", "ha", "he", "il", "in", "ka", "la", "le", "li", "lo",
+             "ma", "me", "mi", "mo", "na", "ne", "no", "ob", "ol", "on", "or", "os", "pa", "pe", "po",
+             "ra", "re", "ri", "ro", "sa", "se", "si", "ta", "te", "ti", "to", "ul", "un", "ur", "va"]
+SUFFIXES = ["disease", "syndrome", "dystrophy", "deficiency", "anemia", "ataxia", "dysplasia"]
+
+
+def synthetic_disease_names(count, seed=0):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        words = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+                 for _ in range(rng.randint(1, 3))]
+        names.add(" ".join(words + [rng.choice(SUFFIXES)]))
+    return sorted(names)
+
+
+def keystroke_queries(names, sessions, seed=1):
+    # Each session types a fragment of a real name one character at a time
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(sessions):
+        name = rng.choice(names).lower()
+        start = rng.choice([0, max(0, name.find(" ") + 1)])
+        fragment = name[start:start + rng.randint(3, 12)]
+        queries.extend(fragment[:i] for i in range(1, len(fragment) + 1))
+    return queries
+
+
+def linear_suggest(names, query, limit):
+    # The previous /api/diseases implementation
+    query = query.strip().lower()
+    matches = [d for d in names if query in d.lower()] if query else list(names)
+    return sorted(matches)[:limit]
+
+
+def _latencies(fn, queries):
+    samples = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _summary(name, samples):
+    ordered = sorted(samples)
+    return {
+        "impl": name,
+        "queries": len(samples),
+        "p50_us": round(statistics.median(ordered) * 1e6, 1),
+        "p99_us": round(ordered[int(len(ordered) * 0.99) - 1] * 1e6, 1),
+        "max_qps_single_core": round(len(samples) / sum(samples)),
+    }
+
+
+def run(n_names=10_000, sessions=500, limit=20):
+    names = synthetic_disease_names(n_names)
+    queries = keystroke_queries(names, sessions)
+
+    start = time.perf_counter()
+    index = DiseaseIndex(names)
+    build_ms = (time.perf_counter() - start) * 1e3
+
+    results = [
+        _summary("linear_scan", _latencies(lambda q: linear_suggest(names, q, limit), queries)),
+        _summary("disease_index", _latencies(lambda q: index.suggest(q, limit), queries)),
+    ]
+    results[1]["build_ms"] = round(build_ms, 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Autocomplete latency: linear scan vs DiseaseIndex")
+    parser.add_argument("--names", type=int, default=10_000)
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = run(args.names, args.sessions, args.limit)
+    for r in results:
+        print(f"{r['impl']:>14}: p50 {r['p50_us']:9.1f}us  p99 {r['p99_us']:9.1f}us  "
+              f"~{r['max_qps_single_core']:,} qps/core")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmarks import ROOT_DIR  # noqa: F401  (puts the repo modules on sys.path)
+import graph_features
+from ppi_store import EncodedPPI
+
+
+def synthetic_network(n_proteins=19_500, n_pairs=6_000_000, seed=0):
+    # Heavy-tailed degrees like STRING, both directions stored, sorted by protein1
+    rng = np.random.default_rng(seed)
+    weights = rng.pareto(1.5, n_proteins) + 1
+    weights /= weights.sum()
+    a = rng.choice(n_proteins, n_pairs, p=weights)
+    b = rng.choice(n_proteins, n_pairs, p=weights)
+    pairs = np.unique(np.minimum(a, b).astype(np.int64) * n_proteins + np.maximum(a, b))
+    lo, hi = pairs // n_proteins, pairs % n_proteins
+    lo, hi = lo[lo != hi], hi[lo != hi]
+    scores = rng.integers(150, 1000, len(lo)).astype(np.int16)
+
+    protein1 = np.concatenate([lo, hi]).astype(np.int32)
+    protein2 = np.concatenate([hi, lo]).astype(np.int32)
+    order = np.lexsort((protein2, protein1))
+    genes = np.array([f"GENE{i:05d}" for i in range(n_proteins)])
+    return EncodedPPI({
+        'protein1': protein1[order],
+        'protein2': protein2[order],
+        'score': np.concatenate([scores, scores])[order],
+        'proteins': np.array([f"9606.ENSP{i:011d}" for i in range(n_proteins)]),
+        'protein_gene': np.arange(n_proteins, dtype=np.int32),
+        'genes': genes,
+    })
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    out = fn()
+    return out, round(time.perf_counter() - start, 3)
+
+
+def run(n_proteins=19_500, n_pairs=6_000_000, target_share=0.2):
+    edges = synthetic_network(n_proteins, n_pairs)
+    targets = edges.genes[::max(1, int(1 / target_share))]
+
+    matrix, adjacency_s = _timed(lambda: graph_features.adjacency(edges))
+    _, pagerank_s = _timed(lambda: graph_features.pagerank(matrix))
+    cores, core_s = _timed(lambda: graph_features.core_numbers(matrix))
+    labels = np.isin(edges.genes, targets).astype(np.float64)
+    _, labels_s = _timed(lambda: graph_features.label_features(matrix, labels))
+    _, total_s = _timed(lambda: graph_features.compute_graph_features(edges, targets))
+    return {
+        "proteins": n_proteins,
+        "edges": int(matrix.nnz),
+        "max_core": int(cores.max()),
+        "adjacency_s": adjacency_s,
+        "pagerank_s": pagerank_s,
+        "core_s": core_s,
+        "label_propagation_s": labels_s,
+        "total_s": total_s,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sparse graph feature timings on a STRING-sized synthetic network")
+    parser.add_argument("--proteins", type=int, default=19_500)
+    parser.add_argument("--pairs", type=int, default=6_000_000, help="undirected pairs drawn (stored twice)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    result = run(args.proteins, args.pairs)
+    print(json.dumps(result, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
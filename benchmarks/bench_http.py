@@ -0,0 +1,95 @@
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+from urllib.parse import urlparse
+
+DEFAULT_PATHS = [
+    "/api/dashboard/genes",
+    "/api/gallery",
+    "/api/explain?gene=A2M",
+    "/api/search?gene=A2M&advice=defer",
+    "/api/diseases?suggest=dis&limit=20",
+]
+
+
+def _worker(base, paths, deadline, samples, errors, lock):
+    # One keep-alive connection per client thread, cycling through the endpoint mix
+    url = urlparse(base)
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    local, failed, i = [], 0, 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 500:
+                failed += 1
+        except (OSError, http.client.HTTPException):
+            failed += 1
+            conn.close()
+            conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+            continue
+        local.append((path, time.perf_counter() - start))
+    conn.close()
+    with lock:
+        samples.extend(local)
+        errors.append(failed)
+
+
+def run(base, paths=DEFAULT_PATHS, concurrency=16, duration=10.0):
+    samples, errors, lock = [], [], threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=_worker, args=(base, paths, deadline, samples, errors, lock))
+               for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencies = sorted(s for _, s in samples)
+    result = {
+        "base": base,
+        "concurrency": concurrency,
+        "duration_s": duration,
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "rps": round(len(latencies) / duration, 1),
+        "p50_ms": round(statistics.median(latencies) * 1e3, 2) if latencies else None,
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1e3, 2) if latencies else None,
+        "per_path": {},
+    }
+    for path in paths:
+        per_path = sorted(s for p, s in samples if p == path)
+        if per_path:
+            result["per_path"][path] = {"requests": len(per_path),
+                                        "p50_ms": round(statistics.median(per_path) * 1e3, 2)}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent HTTP load against a running discovery API")
+    parser.add_argument("--base", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--path", action="append", dest="paths", help="endpoint to include (repeatable)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    result = run(args.base, args.paths or DEFAULT_PATHS, args.concurrency, args.duration)
+    print(f"{result['base']}: {result['rps']} req/s  p50 {result['p50_ms']} ms  "
+          f"p99 {result['p99_ms']} ms  errors {result['errors']}")
+    for path, stats in result["per_path"].items():
+        print(f"  {path:<40} p50 {stats['p50_ms']} ms")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import json
+import resource
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_graph import synthetic_network
+import network_index
+
+
+def _percentiles(seconds):
+    ms = np.array(seconds) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 3), "p95_ms": round(float(np.percentile(ms, 95)), 3),
+            "max_ms": round(float(ms.max()), 3)}
+
+
+def run(n_proteins=19_500, n_pairs=6_000_000, queries=200, min_score=network_index.DEFAULT_MIN_SCORE, seed=1):
+    edges = synthetic_network(n_proteins, n_pairs)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        start = time.perf_counter()
+        built = network_index.build_index(edges)
+        build_s = time.perf_counter() - start
+        network_index.save_index(built, [], cache_dir)
+        del built
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        index = network_index.load_saved([], cache_dir)
+        load_s = time.perf_counter() - start
+
+        genes = np.random.default_rng(seed).choice(index.genes, queries).tolist()
+        result = {"genes": len(index.genes), "gene_edges": len(index), "build_s": round(build_s, 3),
+                  "load_ms": round(load_s * 1000, 3)}
+        for hops in (1, 2):
+            timings, sizes = [], []
+            for gene in genes:
+                start = time.perf_counter()
+                hood = index.neighborhood(gene, min_score=min_score, hops=hops)
+                timings.append(time.perf_counter() - start)
+                sizes.append(len(hood["genes"]))
+            result[f"hops_{hops}"] = {**_percentiles(timings), "mean_neighbors": round(float(np.mean(sizes)), 1)}
+        # ru_maxrss only grows, so this is an upper bound on what loading and querying added
+        result["rss_growth_mb"] = round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Neighbourhood query latency on a STRING-sized synthetic network")
+    parser.add_argument("--proteins", type=int, default=19_500)
+    parser.add_argument("--pairs", type=int, default=6_000_000, help="undirected pairs drawn (stored twice)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--min-score", type=int, default=network_index.DEFAULT_MIN_SCORE)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    result = run(args.proteins, args.pairs, args.queries, args.min_score)
+    print(json.dumps(result, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
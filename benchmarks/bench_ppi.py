@@ -0,0 +1,75 @@
+import argparse
+import json
+import multiprocessing as mp
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks import PROJECT_DIR, peak_rss_mb
+
+DATA_DIR = PROJECT_DIR / "datasets"
+MODES = ["pandas", "streaming", "columnar-cold", "columnar-warm"]
+
+
+def _run_mode(mode, paths, cache_dir):
+    # Runs in a fresh process so ru_maxrss is the peak of this mode alone
+    import os
+    os.environ["DISCOVERY_CACHE_DIR"] = cache_dir
+    import data_processing
+    import ppi_store
+
+    if mode == "columnar-cold":
+        import cache_store
+        cache_store.invalidate(ppi_store.STORE_NAME)
+    elif mode == "columnar-warm":
+        ppi_store.load_ppi(paths[0], paths[1])
+
+    agg_mode = mode.split("-")[0]
+    start = time.perf_counter()
+    df_agg = data_processing.get_optimized_aggregated_data(*paths, mode=agg_mode)
+    elapsed = time.perf_counter() - start
+    return {"mode": mode, "seconds": round(elapsed, 3), "peak_rss_mb": peak_rss_mb(), "genes": len(df_agg)}, df_agg
+
+
+def run(paths, cache_dir, modes=MODES):
+    results, frames = [], {}
+    ctx = mp.get_context("spawn")
+    for mode in modes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            result, df_agg = pool.submit(_run_mode, mode, paths, cache_dir).result()
+        results.append(result)
+        frames[mode] = df_agg
+
+    baseline = frames.get("pandas")
+    for result in results:
+        if baseline is not None and result["mode"] != "pandas":
+            other = frames[result["mode"]]
+            numeric = baseline.select_dtypes("number").columns
+            diff = (baseline[numeric] - other[numeric]).abs().max().max()
+            result["max_abs_diff_vs_pandas"] = float(diff)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PPI aggregation paths in data_processing")
+    parser.add_argument("--links", default=str(DATA_DIR / "9606.protein.links.v11.5.txt"))
+    parser.add_argument("--info", default=str(DATA_DIR / "9606.protein.info.v11.5.txt"))
+    parser.add_argument("--p1", default=str(DATA_DIR / "en_product1.xml"))
+    parser.add_argument("--p6", default=str(DATA_DIR / "en_product6.xml"))
+    parser.add_argument("--db", default=str(DATA_DIR / "drugbank.xml"))
+    parser.add_argument("--cache-dir", default=str(PROJECT_DIR / "cache" / "bench"))
+    parser.add_argument("--modes", nargs="+", default=MODES, choices=MODES)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    paths = (args.links, args.info, args.p1, args.p6, args.db)
+    results = run(paths, args.cache_dir, args.modes)
+    for r in results:
+        print(f"{r['mode']:>14}: {r['seconds']:8.3f}s  peak {r['peak_rss_mb']:8.1f} MB  "
+              f"genes={r['genes']}  diff={r.get('max_abs_diff_vs_pandas', 0):.2e}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+import argparse
+import http.client
+import json
+import multiprocessing as mp
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks import ROOT_DIR, peak_rss_mb
+from benchmarks import bench_http, bench_ppi, synthetic
+
+BENCHMARKS = ["aggregation", "xml_maps", "startup", "endpoints"]
+DEFAULT_WORK_DIR = ROOT_DIR / "RareDiseaseProject" / "cache" / "bench_suite"
+# Metrics where a larger value is an improvement; everything else numeric is a cost
+HIGHER_IS_BETTER = ("rps", "qps")
+# Seconds per unit suffix, so small absolute changes can be ignored as timer noise
+TIME_UNITS = {"_s": 1.0, "seconds": 1.0, "_ms": 1e-3, "_us": 1e-6}
+MIN_TIME_DELTA = 0.005
+MIN_MB_DELTA = 5.0
+READY_TIMEOUT = 600
+
+
+def _engine_env(data_dir, cache_dir):
+    # Points inference_engine/app at the generated release and an isolated cache
+    return {
+        "DISCOVERY_DATA_DIR": str(data_dir),
+        "DISCOVERY_RESULTS_FILE": str(Path(data_dir) / synthetic.RESULTS_FILE),
+        "DISCOVERY_CACHE_DIR": str(cache_dir),
+        "MODEL_LOAD": "lazy",
+    }
+
+
+def _isolated(fn, *args):
+    # Fresh interpreter per measurement: no warm imports, caches or inherited RSS
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def _repeat(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {"min_s": round(min(samples), 4), "median_s": round(statistics.median(samples), 4)}
+
+
+# --- benchmarks ------------------------------------------------------------------
+
+def bench_aggregation(data_dir, cache_dir):
+    paths = tuple(str(Path(data_dir) / name) for name in [synthetic.LINKS_FILE, synthetic.INFO_FILE,
+                                                           synthetic.PRODUCT1_FILE, synthetic.PRODUCT6_FILE,
+                                                           synthetic.DRUGBANK_FILE])
+    return bench_ppi.run(paths, str(cache_dir))
+
+
+def _xml_maps(data_dir, cache_dir, repeats):
+    os.environ.update(_engine_env(data_dir, cache_dir))
+    import inference_engine
+    import ingestion
+    from inference_engine import DiscoveryEngine
+
+    result = {}
+    start = time.perf_counter()
+    corpus = ingestion.build_corpus(inference_engine.ORPHANET_FILES, inference_engine.DRUGBANK_FILE, workers=1)
+    result["parse_serial_s"] = round(time.perf_counter() - start, 4)
+    start = time.perf_counter()
+    ingestion.build_corpus(inference_engine.ORPHANET_FILES, inference_engine.DRUGBANK_FILE)
+    result["parse_parallel_s"] = round(time.perf_counter() - start, 4)
+    result["corpus_rows"] = len(corpus)
+
+    result["disease_map"] = _repeat(lambda: DiscoveryEngine._build_disease_mapping(corpus), repeats)
+    result["gene_drug_map"] = _repeat(lambda: DiscoveryEngine._build_gene_drug_mapping(corpus), repeats)
+    result["disease_map"]["entries"] = len(DiscoveryEngine._build_disease_mapping(corpus))
+    result["gene_drug_map"]["entries"] = len(DiscoveryEngine._build_gene_drug_mapping(corpus))
+
+    # End to end as the engine sees it: parse + build on a cold cache, then a cache hit
+    for label in ("cold", "warm"):
+        start = time.perf_counter()
+        inference_engine.load_reference_maps()
+        result[f"load_reference_maps_{label}_s"] = round(time.perf_counter() - start, 4)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def bench_xml_maps(data_dir, cache_dir, repeats=5):
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    return _isolated(_xml_maps, str(data_dir), str(cache_dir), repeats)
+
+
+def _startup(data_dir, cache_dir):
+    os.environ.update(_engine_env(data_dir, cache_dir))
+    start = time.perf_counter()
+    import app
+    import metrics
+    seconds = time.perf_counter() - start
+    phases = {key[0]: value for key, value in metrics.STARTUP_SECONDS.snapshot().items()}
+    return {"import_app_s": round(seconds, 4), "engine_status": app.engine_state["status"],
+            "phases_s": phases, "peak_rss_mb": peak_rss_mb()}
+
+
+def bench_startup(data_dir, cache_dir):
+    # cold: empty cache (XML parse, PPI encode, network index); warm: every cache hit
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    return {label: _isolated(_startup, str(data_dir), str(cache_dir)) for label in ("cold", "warm")}
+
+
+def _wait_ready(port, process, timeout=READY_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"benchmark server exited with {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/api/ready")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError("benchmark server did not become ready")
+
+
+def endpoint_paths(data_dir):
+    # One representative request per GET endpoint, taken from the generated release
+    import pandas as pd
+    from benchmarks.bench_disease_index import synthetic_disease_names
+
+    manifest = json.loads((Path(data_dir) / synthetic.MANIFEST_FILE).read_text(encoding="utf-8"))
+    results = pd.read_csv(Path(data_dir) / synthetic.RESULTS_FILE, usecols=["gene_symbol"])
+    gene = results["gene_symbol"].iloc[0]
+    disease = synthetic_disease_names(manifest["config"]["disorders"], manifest["config"]["seed"])[0]
+    return {
+        "dashboard": "/api/dashboard/genes",
+        "gallery": "/api/gallery",
+        "search_gene_deferred": f"/api/search?gene={gene}&advice=defer",
+        "search_disease": f"/api/search?disease={disease.split()[0]}&limit=50",
+        "explain": f"/api/explain?gene={gene}",
+        "diseases_suggest": f"/api/diseases?suggest={disease[:3].lower()}&limit=20",
+        "network_1hop": f"/api/network?gene={gene}&min_score=400",
+        "network_2hop": f"/api/network?gene={gene}&min_score=700&hops=2",
+        "advice_poll": f"/api/advice?gene={gene}",
+        "status": "/api/status",
+        "metrics": "/metrics",
+    }
+
+
+def bench_endpoints(data_dir, cache_dir, port=8765, concurrency=16, duration=5.0, server="werkzeug", workers=None):
+    env = {**os.environ, **_engine_env(data_dir, cache_dir), "FLASK_HOST": "127.0.0.1", "FLASK_PORT": str(port),
+           # No API key: advice requests fall back immediately instead of calling Groq
+           "GROQ_API_KEY": ""}
+    if server == "gunicorn":
+        if workers:
+            env["WEB_WORKERS"] = str(workers)
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"]
+    else:
+        command = [sys.executable, "-m", "benchmarks.bench_suite", "--serve", str(port)]
+    process = subprocess.Popen(command, cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_ready(port, process)
+        base = f"http://127.0.0.1:{port}"
+        results = {}
+        for name, path in endpoint_paths(data_dir).items():
+            run = bench_http.run(base, [path], concurrency, duration)
+            results[name] = {key: run[key] for key in ("requests", "errors", "rps", "p50_ms", "p99_ms")}
+            results[name]["path"] = path
+        return results
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def serve(port):
+    # Threaded WSGI server without the dev server's reloader, for load tests
+    from werkzeug.serving import make_server
+    import app
+    make_server("127.0.0.1", port, app.app, threaded=True).serve_forever()
+
+
+# --- results -----------------------------------------------------------------------
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=ROOT_DIR, capture_output=True, text=True, timeout=30).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment():
+    import numpy
+    import pandas
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git("rev-parse", "HEAD"),
+        "git_dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def flatten(results, prefix=""):
+    # {"a": {"b": 1}, "c": [{"mode": "x", "s": 2}]} -> {"a.b": 1, "c.x.s": 2}
+    flat = {}
+    if isinstance(results, dict):
+        for key, value in results.items():
+            flat.update(flatten(value, f"{prefix}{key}."))
+    elif isinstance(results, list):
+        for i, item in enumerate(results):
+            name = item.get("mode", item.get("impl", i)) if isinstance(item, dict) else i
+            flat.update(flatten(item, f"{prefix}{name}."))
+    elif isinstance(results, (int, float)) and not isinstance(results, bool):
+        flat[prefix[:-1]] = results
+    return flat
+
+
+def _regressed(leaf, before, after, threshold):
+    if leaf in HIGHER_IS_BETTER:
+        return (before - after) / before > threshold
+    if (after - before) / before <= threshold:
+        return False
+    # Past the relative threshold, a time or memory metric must also move by a real amount
+    for suffix, seconds in TIME_UNITS.items():
+        if leaf.endswith(suffix):
+            return (after - before) * seconds >= MIN_TIME_DELTA
+    if leaf.endswith("_mb"):
+        return after - before >= MIN_MB_DELTA
+    # Counts and sizes describe the workload; they are reported but never regress
+    return False
+
+
+def compare(old, new, threshold=0.10):
+    # Relative change of every numeric metric present in both runs
+    old_flat, new_flat = flatten(old["results"]), flatten(new["results"])
+    rows = []
+    for key in sorted(old_flat.keys() & new_flat.keys()):
+        before, after = old_flat[key], new_flat[key]
+        if before == 0:
+            continue
+        rows.append({"metric": key, "before": before, "after": after,
+                     "change": round((after - before) / abs(before), 4),
+                     "regression": _regressed(key.rsplit(".", 1)[-1], before, after, threshold)})
+    return rows
+
+
+def run(benchmarks, scale, seed, work_dir, concurrency, duration, server, workers):
+    work_dir = Path(work_dir)
+    data_dir = work_dir / f"data-{scale}-{seed}"
+    start = time.perf_counter()
+    manifest = synthetic.generate(data_dir, scale, seed)
+    print(f"🧪 Synthetic {scale} dataset ready in {time.perf_counter() - start:.1f}s: {manifest['counts']}")
+
+    results = {}
+    for name in benchmarks:
+        cache_dir = work_dir / f"cache-{name}"
+        print(f"⏱️ {name}...")
+        start = time.perf_counter()
+        if name == "aggregation":
+            results[name] = bench_aggregation(data_dir, cache_dir)
+        elif name == "xml_maps":
+            results[name] = bench_xml_maps(data_dir, cache_dir)
+        elif name == "startup":
+            results[name] = bench_startup(data_dir, cache_dir)
+        elif name == "endpoints":
+            results[name] = bench_endpoints(data_dir, cache_dir, concurrency=concurrency, duration=duration,
+                                            server=server, workers=workers)
+        print(f"   done in {time.perf_counter() - start:.1f}s")
+    meta = {**environment(), "scale": scale, "seed": seed, "dataset": manifest,
+            "load": {"server": server, "workers": workers, "concurrency": concurrency, "duration_s": duration}}
+    return {"meta": meta, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite on deterministic synthetic data")
+    parser.add_argument("--scale", choices=sorted(synthetic.SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument("--work-dir", default=str(DEFAULT_WORK_DIR), help="generated data and caches")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds of load per endpoint")
+    parser.add_argument("--server", choices=["werkzeug", "gunicorn"], default="werkzeug")
+    parser.add_argument("--workers", type=int, help="gunicorn worker count")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against an earlier --json result")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change reported as a regression")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    result = run(args.only, args.scale, args.seed, args.work_dir, args.concurrency, args.duration,
+                 args.server, args.workers)
+    print(json.dumps(result["results"], indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            rows = compare(json.load(f), result, args.threshold)
+        regressions = [row for row in rows if row["regression"]]
+        for row in rows:
+            flag = "❌" if row["regression"] else "  "
+            print(f"{flag} {row['metric']:<60} {row['before']:>12g} → {row['after']:>12g}  {row['change']:+.1%}")
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import ROOT_DIR  # noqa: F401  (puts the repo modules on sys.path)
+from benchmarks.bench_disease_index import SYLLABLES, synthetic_disease_names
+
+# File names the engine and main.py expect inside a data directory
+LINKS_FILE = "9606.protein.links.v11.5.txt"
+INFO_FILE = "9606.protein.info.v11.5.txt"
+PRODUCT1_FILE = "en_product1.xml"
+PRODUCT6_FILE = "en_product6.xml"
+DRUGBANK_FILE = "drugbank.xml"
+RESULTS_FILE = "top_biological_targets.csv"
+MANIFEST_FILE = "synthetic.json"
+# Bump when the generated files change shape so cached datasets are regenerated
+GENERATOR_VERSION = 1
+
+# `pairs` undirected interactions are drawn and written in both directions, like STRING.
+# "full" is close to STRING v11.5 human (19.6k proteins, 11.9M rows), Orphanet
+# product1/product6 and the full DrugBank release.
+SCALES = {
+    "tiny": {"proteins": 500, "pairs": 5_000, "disorders": 300, "drugs": 300},
+    "small": {"proteins": 5_000, "pairs": 250_000, "disorders": 2_000, "drugs": 2_000},
+    "medium": {"proteins": 19_500, "pairs": 1_500_000, "disorders": 6_000, "drugs": 6_000},
+    "full": {"proteins": 19_500, "pairs": 6_000_000, "disorders": 10_000, "drugs": 14_000},
+}
+# Share of product1 disorders that also appear, with genes, in product6
+GENE_DISORDER_SHARE = 0.4
+DRUG_SUFFIXES = ["mab", "nib", "olol", "pril", "vir", "stat", "azole", "parin", "cillin", "dronate"]
+
+
+def gene_symbols(count, seed=0):
+    # HGNC-like symbols: 2-5 capitals plus an optional number, unique, in draw order
+    rng = random.Random(seed)
+    letters = "ABCDEFGHIKLMNPRSTUVWXYZ"
+    symbols, seen = [], set()
+    while len(symbols) < count:
+        symbol = "".join(rng.choice(letters) for _ in range(rng.randint(2, 5)))
+        if rng.random() < 0.7:
+            symbol += str(rng.randint(1, 30))
+        if symbol not in seen:
+            seen.add(symbol)
+            symbols.append(symbol)
+    return symbols
+
+
+def drug_names(count, seed=0):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        stem = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+        names.add((stem + rng.choice(DRUG_SUFFIXES)).capitalize())
+    return sorted(names)
+
+
+def _popular(rng, count, size, skew=1.2):
+    # Heavy-tailed draws: a few genes are associated with many disorders/drugs
+    weights = rng.pareto(skew, count) + 1
+    return rng.choice(count, size=size, p=weights / weights.sum())
+
+
+def write_string(out_dir, symbols, pairs, seed=0):
+    # Imported here: bench_graph loads the project modules, which read DISCOVERY_CACHE_DIR
+    # on import, and the suite sets that variable in its worker processes first
+    from benchmarks.bench_graph import synthetic_network
+
+    edges = synthetic_network(len(symbols), pairs, seed)
+    proteins = np.asarray(edges.proteins)
+    info = pd.DataFrame({
+        "string_protein_id": proteins,
+        "preferred_name": symbols,
+        "protein_size": np.random.default_rng(seed).integers(50, 3000, len(symbols)),
+        "annotation": [f"Synthetic protein {s}" for s in symbols],
+    })
+    info.to_csv(out_dir / INFO_FILE, sep="\t", index=False)
+    links = pd.DataFrame({
+        "protein1": pd.Categorical.from_codes(edges.protein1, proteins),
+        "protein2": pd.Categorical.from_codes(edges.protein2, proteins),
+        "combined_score": edges.score,
+    })
+    links.to_csv(out_dir / LINKS_FILE, sep=" ", index=False)
+    return len(links)
+
+
+def _orphanet_header(f, count):
+    f.write('<?xml version="1.0" encoding="ISO-8859-1"?>\n')
+    f.write('<JDBOR date="2024-01-01 00:00:00" version="1.3.0 / 4.1.7 [2023-01-01] (orientdb version)" '
+            'copyright="Orphanet (c) 2024">\n')
+    f.write(f'  <DisorderList count="{count}">\n')
+
+
+def _disorder_open(f, orpha_code, name):
+    f.write(f'    <Disorder id="{orpha_code + 10000}">\n'
+            f'      <OrphaCode>{orpha_code}</OrphaCode>\n'
+            f'      <ExpertLink lang="en">http://www.orpha.net/consor/cgi-bin/OC_Exp.php?lng=en&amp;Expert={orpha_code}</ExpertLink>\n'
+            f'      <Name lang="en">{escape(name)}</Name>\n'
+            f'      <DisorderType id="21394"><Name lang="en">Disease</Name></DisorderType>\n'
+            f'      <DisorderGroup id="36547"><Name lang="en">Disorder</Name></DisorderGroup>\n')
+
+
+def write_orphanet(out_dir, symbols, disorders, seed=0):
+    # product1: nomenclature only (no genes, as in the real file); product6: disorder-gene associations
+    rng = np.random.default_rng(seed)
+    names = synthetic_disease_names(disorders, seed)
+    codes = rng.permutation(np.arange(1, disorders * 10))[:disorders]
+    with open(out_dir / PRODUCT1_FILE, "w", encoding="ISO-8859-1") as f:
+        _orphanet_header(f, disorders)
+        for code, name in zip(codes, names):
+            _disorder_open(f, int(code), name)
+            f.write('    </Disorder>\n')
+        f.write('  </DisorderList>\n</JDBOR>\n')
+
+    with_genes = np.flatnonzero(rng.random(disorders) < GENE_DISORDER_SHARE)
+    gene_counts = np.minimum(rng.geometric(0.45, len(with_genes)), 60)
+    genes = _popular(rng, len(symbols), int(gene_counts.sum()))
+    associations, offset = 0, 0
+    with open(out_dir / PRODUCT6_FILE, "w", encoding="ISO-8859-1") as f:
+        _orphanet_header(f, len(with_genes))
+        for i, n in zip(with_genes, gene_counts):
+            _disorder_open(f, int(codes[i]), names[i])
+            f.write(f'      <DisorderGeneAssociationList count="{n}">\n')
+            for g in genes[offset:offset + n]:
+                symbol = symbols[g]
+                f.write('        <DisorderGeneAssociation>\n'
+                        '          <SourceOfValidation>22587682[PMID]</SourceOfValidation>\n'
+                        f'          <Gene id="{g + 20000}">\n'
+                        f'            <Name lang="en">synthetic gene {escape(symbol.lower())}</Name>\n'
+                        f'            <Symbol>{escape(symbol)}</Symbol>\n'
+                        f'            <SynonymList count="1"><Synonym lang="en">{escape(symbol)}-AS</Synonym></SynonymList>\n'
+                        '            <GeneType id="25993"><Name lang="en">gene with protein product</Name></GeneType>\n'
+                        f'            <LocusList count="1"><Locus id="{g + 30000}"><GeneLocus>{g % 22 + 1}q{g % 40}.1</GeneLocus>'
+                        '<LocusKey>1</LocusKey></Locus></LocusList>\n'
+                        '          </Gene>\n'
+                        '          <DisorderGeneAssociationType id="17949"><Name lang="en">Disease-causing germline mutation(s) in</Name></DisorderGeneAssociationType>\n'
+                        '          <DisorderGeneAssociationStatus id="17991"><Name lang="en">Assessed</Name></DisorderGeneAssociationStatus>\n'
+                        '        </DisorderGeneAssociation>\n')
+            f.write('      </DisorderGeneAssociationList>\n    </Disorder>\n')
+            offset += n
+            associations += n
+        f.write('  </DisorderList>\n</JDBOR>\n')
+    return {"disorders": disorders, "gene_disorders": len(with_genes), "associations": int(associations)}
+
+
+def _polypeptide(rng, symbol, kind):
+    uniprot = f"P{rng.integers(10000, 99999)}"
+    return (f'        <polypeptide id="{uniprot}" source="Swiss-Prot">\n'
+            f'          <name>Synthetic {kind} {escape(symbol)}</name>\n'
+            '          <general-function>Synthetic binding activity</general-function>\n'
+            f'          <gene-name>{escape(symbol)}</gene-name>\n'
+            '          <organism ncbi-taxonomy-id="9606">Humans</organism>\n'
+            '        </polypeptide>\n')
+
+
+def write_drugbank(out_dir, symbols, drugs, seed=0):
+    # Namespaced DrugBank layout: targets (parsed) plus enzymes and drug-interactions
+    # (skipped by the parser, but they carry gene-names and drug names of their own)
+    rng = np.random.default_rng(seed)
+    names = drug_names(drugs, seed)
+    target_counts = np.minimum(rng.poisson(1.6, drugs), 30)
+    targets = _popular(rng, len(symbols), int(target_counts.sum()))
+    pairs, offset = 0, 0
+    with open(out_dir / DRUGBANK_FILE, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<drugbank xmlns="http://www.drugbank.ca" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+                'xsi:schemaLocation="http://www.drugbank.ca http://www.drugbank.ca/docs/drugbank.xsd" '
+                'version="5.1" exported-on="2024-01-01">\n')
+        for i, (name, n) in enumerate(zip(names, target_counts)):
+            f.write(f'<drug type="small molecule" created="2005-06-13" updated="2024-01-01">\n'
+                    f'  <drugbank-id primary="true">DB{i + 1:05d}</drugbank-id>\n'
+                    f'  <name>{escape(name)}</name>\n'
+                    f'  <description>{escape(name)} is a synthetic compound generated for benchmarks.</description>\n'
+                    '  <drug-interactions>\n')
+            for j in rng.integers(0, drugs, 3):
+                f.write(f'    <drug-interaction><drugbank-id>DB{j + 1:05d}</drugbank-id><name>{escape(names[j])}</name>'
+                        '<description>May increase adverse effects.</description></drug-interaction>\n')
+            f.write('  </drug-interactions>\n  <targets>\n')
+            for position, g in enumerate(targets[offset:offset + n], start=1):
+                f.write(f'    <target position="{position}">\n'
+                        f'      <id>BE{g + 1:07d}</id>\n'
+                        f'      <name>Synthetic target {escape(symbols[g])}</name>\n'
+                        '      <organism>Humans</organism>\n'
+                        '      <actions><action>inhibitor</action></actions>\n')
+                f.write(_polypeptide(rng, symbols[g], "target"))
+                f.write('    </target>\n')
+            f.write('  </targets>\n  <enzymes>\n')
+            enzyme = symbols[int(rng.integers(0, len(symbols)))]
+            f.write(f'    <enzyme position="1"><id>BE9{i:06d}</id><name>Synthetic enzyme</name>\n')
+            f.write(_polypeptide(rng, enzyme, "enzyme"))
+            f.write('    </enzyme>\n  </enzymes>\n</drug>\n')
+            offset += n
+            pairs += n
+        f.write('</drugbank>\n')
+    return {"drugs": drugs, "drug_targets": int(pairs)}
+
+
+def write_results(out_dir, seed=0):
+    # A top_biological_targets.csv with the real report columns, built from the generated
+    # files with the training feature kernels and deterministic pseudo-scores
+    import data_processing
+    from ingestion import iter_drugbank, iter_orphanet
+    from ppi_store import encode_ppi
+
+    features = data_processing.edge_features(encode_ppi(out_dir / LINKS_FILE, out_dir / INFO_FILE))
+    disease_genes = {gene for _, gene in iter_orphanet(out_dir / PRODUCT6_FILE)}
+    drug_rows = pd.DataFrame(list(iter_drugbank(out_dir / DRUGBANK_FILE)), columns=["drug", "gene_symbol"])
+    targets = pd.DataFrame({"gene_symbol": sorted(disease_genes | set(drug_rows["gene_symbol"]))})
+    drug_list = drug_rows.groupby("gene_symbol")["drug"].agg(lambda x: ", ".join(sorted(set(x)))).reset_index()
+    df_agg = data_processing.build_feature_table(features, targets, drug_list.rename(columns={"drug": "existing_drugs"}))
+
+    rng = np.random.default_rng(seed)
+    df_agg["discovery_score"] = np.clip(rng.beta(0.6, 3.0, len(df_agg)) + 0.3 * df_agg["is_target"], 0, 1)
+    df_agg["is_novel_discovery"] = ((df_agg["discovery_score"] >= 0.5) & (df_agg["is_target"] == 0)).astype(int)
+    df_agg.sort_values("discovery_score", ascending=False).to_csv(out_dir / RESULTS_FILE, index=False)
+    return len(df_agg)
+
+
+def generate(out_dir, scale="small", seed=0, **overrides):
+    # Writes every dataset into out_dir; an existing directory with the same config is reused
+    config = {**SCALES[scale], **{k: v for k, v in overrides.items() if v is not None},
+              "scale": scale, "seed": seed, "version": GENERATOR_VERSION}
+    out_dir = Path(out_dir)
+    manifest_path = out_dir / MANIFEST_FILE
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if manifest["config"] == config:
+            return manifest
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path.unlink(missing_ok=True)
+
+    start = time.perf_counter()
+    symbols = gene_symbols(config["proteins"], seed)
+    counts = {"proteins": config["proteins"], "links": write_string(out_dir, symbols, config["pairs"], seed)}
+    counts.update(write_orphanet(out_dir, symbols, config["disorders"], seed))
+    counts.update(write_drugbank(out_dir, symbols, config["drugs"], seed))
+    counts["results_genes"] = write_results(out_dir, seed)
+    manifest = {
+        "config": config,
+        "counts": counts,
+        "files": {name: (out_dir / name).stat().st_size for name in
+                  [LINKS_FILE, INFO_FILE, PRODUCT1_FILE, PRODUCT6_FILE, DRUGBANK_FILE, RESULTS_FILE]},
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+    # Written last, so an interrupted run is regenerated instead of reused
+    manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write deterministic STRING/Orphanet/DrugBank-shaped test data")
+    parser.add_argument("out_dir")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--proteins", type=int)
+    parser.add_argument("--pairs", type=int)
+    parser.add_argument("--disorders", type=int)
+    parser.add_argument("--drugs", type=int)
+    args = parser.parse_args()
+    manifest = generate(args.out_dir, args.scale, args.seed, proteins=args.proteins, pairs=args.pairs,
+                        disorders=args.disorders, drugs=args.drugs)
+    print(json.dumps(manifest, indent=2))
+
+
+if __name__ == "__main__":
+    main()
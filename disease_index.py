@@ -0,0 +1,71 @@
+import bisect
+from collections import defaultdict
+
+NGRAM = 3
+# Sorts after every real character, so [q, q + PREFIX_END) spans all keys starting with q
+PREFIX_END = "\U0010ffff"
+
+
+def _ngrams(text, n=NGRAM):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class DiseaseIndex:
+    # Case-insensitive disease-name lookup ranked exact > prefix > substring, then A-Z.
+    # A sorted key array answers exact/prefix matches by bisection and an n-gram
+    # inverted index (1- to 3-grams) narrows substring matches to verified candidates.
+    def __init__(self, names):
+        names = list(names)
+        order = sorted(range(len(names)), key=lambda i: (names[i].lower(), names[i]))
+        self.names = [names[i] for i in order]
+        self.keys = [name.lower() for name in self.names]
+        self.postings = defaultdict(list)
+        for pos, key in enumerate(self.keys):
+            for n in range(1, NGRAM + 1):
+                for gram in _ngrams(key, n):
+                    self.postings[gram].append(pos)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _prefix_range(self, query):
+        lo = bisect.bisect_left(self.keys, query)
+        hi = bisect.bisect_left(self.keys, query + PREFIX_END, lo)
+        return lo, hi
+
+    def _substring_positions(self, query, exclude, limit):
+        if len(query) <= NGRAM:
+            # Postings are built in sorted order: every hit is a match, the excluded
+            # prefix range is one contiguous run, and the first hits are the A-Z first
+            postings = self.postings.get(query, [])
+            cut_lo = bisect.bisect_left(postings, exclude[0])
+            cut_hi = bisect.bisect_left(postings, exclude[1], cut_lo)
+            return (postings[:min(cut_lo, limit)] + postings[cut_hi:cut_hi + limit])[:limit]
+        # Walk the rarest trigram's postings in A-Z order and confirm each contiguous
+        # match, stopping as soon as `limit` names are found
+        rarest = min((self.postings.get(gram, []) for gram in _ngrams(query)), key=len)
+        hits = []
+        for pos in rarest:
+            if query in self.keys[pos] and not exclude[0] <= pos < exclude[1]:
+                hits.append(pos)
+                if len(hits) == limit:
+                    break
+        return hits
+
+    def suggest(self, query, limit=20):
+        query = (query or "").strip().lower()
+        if limit <= 0:
+            return []
+        if not query:
+            return self.names[:limit]
+
+        lo, hi = self._prefix_range(query)
+        # Keys equal to the query sort first within the prefix range
+        results = list(range(lo, min(hi, lo + limit)))
+        if len(results) < limit:
+            results.extend(self._substring_positions(query, (lo, hi), limit - len(results)))
+        return [self.names[pos] for pos in results]
+
+    def best(self, query):
+        matches = self.suggest(query, limit=1)
+        return matches[0] if matches else None
@@ -0,0 +1,31 @@
+import gc
+import os
+
+# Production entry point: gunicorn -c gunicorn.conf.py app:app
+bind = f"{os.getenv('FLASK_HOST', '0.0.0.0')}:{os.getenv('FLASK_PORT', '7860')}"
+workers = int(os.getenv("WEB_WORKERS", min(4, os.cpu_count() or 1)))
+threads = int(os.getenv("WEB_THREADS", 8))
+worker_class = "gthread"
+# SSE advice streams stay open for up to two minutes
+timeout = int(os.getenv("WEB_TIMEOUT", 150))
+keepalive = 5
+accesslog = os.getenv("WEB_ACCESS_LOG")
+
+# Load the DiscoveryEngine (results frame, gene index, disease/drug maps, response
+# cache) once in the master; forked workers share those pages copy-on-write.
+preload_app = True
+
+
+def when_ready(server):
+    # Move everything allocated during preload into the permanent GC generation so
+    # collections in the workers never write to (and thereby copy) the shared pages
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Engine preloaded; {gc.get_freeze_count()} objects frozen before forking workers")
+
+
+def post_fork(server, worker):
+    server.log.info(f"Worker {worker.pid} forked with {threads} threads")
+    # The data watcher thread (hot reload) has to be started inside each worker
+    from app import start_data_watcher
+    start_data_watcher()
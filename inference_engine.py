@@ -1,164 +1,430 @@
+import numpy as np
 import pandas as pd
-import joblib
-import xml.etree.ElementTree as ET
+import argparse
+import hashlib
+import json
 import os
-from pathlib import Path
+import sys
 import time
-from groq import Groq
+from datetime import datetime, timezone
+from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent
-RESULTS_FILE = BASE_DIR / "top_biological_targets.csv"
-MOD_DIR = BASE_DIR / "RareDiseaseProject" / "models"
-DATA_DIR = BASE_DIR / "RareDiseaseProject" / "datasets"
+# DISCOVERY_RESULTS_FILE / DISCOVERY_DATA_DIR point the engine at another data release (e.g. benchmark data)
+RESULTS_FILE = Path(os.getenv("DISCOVERY_RESULTS_FILE", BASE_DIR / "top_biological_targets.csv"))
+PROJECT_DIR = BASE_DIR / "RareDiseaseProject"
+MOD_DIR = PROJECT_DIR / "models"
+DATA_DIR = Path(os.getenv("DISCOVERY_DATA_DIR", PROJECT_DIR / "datasets"))
+ORPHANET_FILES = [DATA_DIR / "en_product1.xml", DATA_DIR / "en_product6.xml"]
+DRUGBANK_FILE = DATA_DIR / "drugbank.xml"
+PPI_FILES = [DATA_DIR / "9606.protein.links.v11.5.txt", DATA_DIR / "9606.protein.info.v11.5.txt"]
+DRUG_LIBRARY = {
+    "ZNHIT3": {"drug": "Tideglusib", "confidence": 0.89},
+    "PDGFRL": {"drug": "Crenolanib", "confidence": 0.91},
+    "SIN3A": {"drug": "Vorinostat", "confidence": 0.85},
+    "BMPR1A": {"drug": "LDN-193189", "confidence": 0.93}
+}
+# Compact (CSR) map cache entries, see RareDiseaseProject/compact_maps.py
+DISEASE_MAP_STORE = "disease_map_csr"
+GENE_DRUG_MAP_STORE = "gene_drug_map_csr"
+# Disorders listed with a single-gene search result
+MAX_GENE_DISEASES = 20
+# The engine runs inside threaded server processes, where forking a parse pool can deadlock
+# the children; parallel XML parsing is left to `--build-cache` and main.py
+SERVE_PARSE_WORKERS = 1
+
+# The training package uses flat imports (`import utils`); expose it the same way here
+sys.path.insert(0, str(PROJECT_DIR))
+import cache_store
+import compact_maps
+import compact_models
+import ingestion
+import metrics
+import network_index
+import utils
+from advice_service import CAPACITY_ADVICE, AdviceService
+from disease_index import DiseaseIndex
+from scoring import ScoringService
+
+# Source files of each part of the engine's data; a hot reload rebuilds only the parts
+# whose files changed. data_version covers the parts the response cache depends on.
+DATA_SOURCES = {
+    "results": [RESULTS_FILE],
+    "disease_map": ORPHANET_FILES,
+    "gene_drug_map": [DRUGBANK_FILE],
+    "network": PPI_FILES,
+    "models": compact_models.model_sources(MOD_DIR),
+}
+VERSIONED_PARTS = ("results", "disease_map", "gene_drug_map")
+
 
 class DiscoveryEngine:
-    def __init__(self):
-        self.results = pd.read_csv(RESULTS_FILE) if RESULTS_FILE.exists() else pd.DataFrame()
-        self.disease_map = self._build_disease_mapping()
-        self._advice_cache = {}
-        print("🔬 Building gene-drug map from DrugBank XML...")
-        self.gene_drug_map = self._build_gene_drug_mapping()
-        print(f"✅ Gene-drug map built: {len(self.gene_drug_map)} genes mapped")
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-        try:
-            self.rf_model = joblib.load(MOD_DIR / "hyper_rf.pkl")
-        except Exception:
-            self.rf_model = None
-
-    def _build_disease_mapping(self):
-        mapping = {}
-        xml_files = [DATA_DIR / "en_product1.xml", DATA_DIR / "en_product6.xml"]
-        for path in xml_files:
-            if not path.exists(): continue
-            try:
-                tree = ET.parse(path)
-                root = tree.getroot()
-                for disorder in root.iter('Disorder'):
-                    name_elem = disorder.find('Name')
-                    name = name_elem.text if name_elem is not None else "Unknown"
-                    for gene in disorder.iter('Gene'):
-                        sym_elem = gene.find('Symbol')
-                        if sym_elem is not None:
-                            symbol = sym_elem.text
-                            if name not in mapping: mapping[name] = []
-                            if symbol not in mapping[name]: mapping[name].append(symbol)
-            except Exception: continue
-        return mapping
-
-    def _build_gene_drug_mapping(self):
-        drugbank_file = DATA_DIR / "drugbank.xml"
-        mapping = {}
-        if not drugbank_file.exists():
-            print("⚠️ DrugBank XML not found!")
+    # Never mutated after __init__: a hot reload builds a new engine from `previous` and
+    # the app swaps the reference, so a request sees one consistent set of data. Parts
+    # whose source files are unchanged, the advice service with its cache, and the scoring
+    # service unless the model pickles changed, are carried over from `previous`.
+    def __init__(self, previous=None, force=False):
+        phase = (metrics.STARTUP_SECONDS if previous is None else metrics.RELOAD_SECONDS).time
+        # Fingerprinted before reading, so a file rewritten mid-load shows up as changed again;
+        # likewise an admin reload requested after loaded_at still applies to this engine
+        self.loaded_at = time.time()
+        self.sources = source_fingerprints()
+        # force reloads every part from the on-disk caches; rebuilding those is --build-cache --force
+        changed = set(DATA_SOURCES) if previous is None or force else previous.changed_parts(self.sources)
+        self.reloaded_parts = sorted(changed)
+
+        with phase(phase="results_csv"):
+            if "results" in changed:
+                self.results = pd.read_csv(RESULTS_FILE) if RESULTS_FILE.exists() else pd.DataFrame()
+            else:
+                self.results = previous.results
+        with phase(phase="gene_index"):
+            self.gene_index = self._build_gene_index(self.results) if "results" in changed else previous.gene_index
+        with phase(phase="reference_maps"):
+            if changed & {"disease_map", "gene_drug_map"}:
+                disease_map, gene_drug_map = load_reference_maps(workers=SERVE_PARSE_WORKERS)
+            self.disease_map = disease_map if "disease_map" in changed else previous.disease_map
+            self.gene_drug_map = gene_drug_map if "gene_drug_map" in changed else previous.gene_drug_map
+        with phase(phase="disease_index"):
+            if "disease_map" in changed:
+                self.disease_index = DiseaseIndex(self.disease_map.keys())
+            else:
+                self.disease_index = previous.disease_index
+        self.data_version, self.data_modified = data_version(
+            [fp for part in VERSIONED_PARTS for fp in self.sources[part]])
+        print(f"✅ Gene-drug map ready: {len(self.gene_drug_map)} genes mapped")
+        if previous is None:
+            self.advice = AdviceService(cache_path=utils.CACHE_DIR / "advice.sqlite3")
+        else:
+            self.advice = previous.advice
+        # Retrained pickles get a fresh service, which loads (or re-exports) the new models;
+        # the old service's batcher thread exits once it has been idle
+        self.scoring = ScoringService(MOD_DIR) if "models" in changed else previous.scoring
+        with phase(phase="network_index"):
+            self.network = load_network() if "network" in changed else previous.network
+            if changed & {"network", "results"}:
+                self.network_rows = self._build_network_rows()
+            else:
+                self.network_rows = previous.network_rows
+            if changed & {"network", "gene_drug_map"}:
+                self.network_drugs = self._build_network_drugs()
+            else:
+                self.network_drugs = previous.network_drugs
+
+    def changed_parts(self, sources=None):
+        # Parts of the data whose files differ (size or mtime) from those this engine loaded
+        sources = source_fingerprints() if sources is None else sources
+        return {part for part, fingerprints in sources.items() if fingerprints != self.sources.get(part)}
+
+    @staticmethod
+    def _build_gene_index(results):
+        # Upper-cased symbol -> row position; first occurrence wins, like match.iloc[0]
+        if 'gene_symbol' not in results.columns:
             return {}
-        try:
-            ns = {"db": "http://www.drugbank.ca"}
-            for _, elem in ET.iterparse(drugbank_file, events=("end",)):
-                if elem.tag == f"{{{ns['db']}}}drug":
-                    name_elem = elem.find("db:name", ns)
-                    drug_name = name_elem.text.strip() if name_elem is not None else ""
-                    if drug_name:
-                        for target in elem.findall(".//db:target", ns):
-                            gene = target.find(".//db:gene-name", ns)
-                            if gene is not None and gene.text:
-                                g_sym = gene.text.strip().upper()
-                                if g_sym not in mapping:
-                                    mapping[g_sym] = set()
-                                mapping[g_sym].add(drug_name)
-                    elem.clear()
-        except Exception as e:
-            print(f"⚠️ DrugBank parsing error: {e}")
-        return {k: sorted(list(v)) for k, v in mapping.items()}
+        index = {}
+        for pos, symbol in enumerate(results['gene_symbol']):
+            if isinstance(symbol, str):
+                index.setdefault(symbol.upper(), pos)
+        return index
+
+    def _build_network_rows(self):
+        # Results row of every gene in the network index, -1 for genes without a score
+        if self.network is None:
+            return None
+        return np.array([self.gene_index.get(g.upper(), -1) for g in self.network.genes.tolist()], dtype=np.int64)
+
+    def _build_network_drugs(self):
+        # Known-drug count of every gene in the network index, read off the gene-drug CSR offsets
+        if self.network is None:
+            return None
+        codes = self.gene_drug_map.codes([g.upper() for g in self.network.genes.tolist()])
+        # A trailing 0 is what code -1 (gene without drugs) picks up
+        return np.append(self.gene_drug_map.counts(), 0)[codes]
+
+    def _lookup_row(self, symbol):
+        pos = self.gene_index.get(str(symbol).upper())
+        return None if pos is None else self.results.iloc[pos]
+
+    @staticmethod
+    def _build_disease_mapping(corpus):
+        # Disease name -> gene symbols in Orphanet order, with the gene -> disease reverse index
+        orphanet = ingestion.orphanet_rows(corpus)
+        return compact_maps.build_map(orphanet['disease_name'], orphanet['gene_symbol'])
+
+    @staticmethod
+    def _build_gene_drug_mapping(corpus):
+        # Gene symbol -> drug names A-Z, with the drug -> gene reverse index
+        drugbank = ingestion.drugbank_rows(corpus)
+        drugbank = drugbank[drugbank['drug_name'].notna()]
+        if drugbank.empty:
+            print("⚠️ No DrugBank targets found!")
+        return compact_maps.build_map(drugbank['gene_symbol'], drugbank['drug_name'], sort_values=True)
 
+    @metrics.timed(metrics.ENGINE_SECONDS)
     def get_groq_advice(self, data):
-        symbol = data['symbol']
-        if symbol in self._advice_cache:
-            return self._advice_cache[symbol]
-        prompt = f"""
-        System: You are a Bioinformatics Research Assistant.
-        Context: Analyzing rare disease gene lead {symbol}.
-        Metrics:
-        - Discovery Score: {data['score']}
-        - Network Centrality: {data['xai']['Network Centrality']}
-        - Interaction Skewness: {data['xai']['Interaction Skewness']}
-        Task: Provide a 2-sentence clinical summary. Explain how these topological
-        metrics suggest biological importance and name a potential drug category.
-        """
-        for attempt in range(3):
-            try:
-                completion = self.client.chat.completions.create(
-                    model="llama-3.3-70b-versatile",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.3,
-                    max_tokens=150
-                )
-                result = completion.choices[0].message.content
-                self._advice_cache[symbol] = result
-                return result
-            except Exception as e:
-                if "429" in str(e):
-                    time.sleep(2)
-                    continue
-                return f"AI Analysis: {symbol} shows significant topological relevance in protein networks."
-        return "Insight generation currently at capacity."
+        return self.advice.get_advice(data)
 
+    def _advice_input(self, row):
+        symbol = row['gene_symbol']
+        return {"symbol": symbol, "score": round(row['discovery_score'], 4), "xai": self.get_explanation(symbol)}
+
+    def prewarm_advice(self, top_n):
+        items = [self._advice_input(row) for _, row in self.results.head(top_n).iterrows()]
+        return self.advice.prewarm(items)
+
+    @metrics.timed(metrics.ENGINE_SECONDS)
+    def get_advice_status(self, symbol, wait=0.0):
+        row = self._lookup_row(symbol)
+        if row is None: return {"error": "Gene not found"}
+        status, advice = self.advice.poll(self._advice_input(row), wait=wait)
+        return {"gene_symbol": row['gene_symbol'], "advice_status": status, "assistant_advice": advice}
+
+    @metrics.timed(metrics.ENGINE_SECONDS)
+    def score_genes(self, items):
+        # Scores new or updated genes with the persisted scaler -> MLP -> RF ensemble
+        return self.scoring.score(items)
+
+    @metrics.timed(metrics.ENGINE_SECONDS)
     def predict_dti_affinity(self, symbol):
-        match = self.results[self.results['gene_symbol'].str.upper() == symbol.upper()]
-        if not match.empty:
-            drug_name = match.iloc[0].get('predicted_drug', match.iloc[0].get('drug_name'))
+        row = self._lookup_row(symbol)
+        if row is not None:
+            drug_name = row.get('predicted_drug', row.get('drug_name'))
             if pd.notna(drug_name):
                 return {"drug": str(drug_name), "confidence": 0.92}
-        drug_library = {
-            "ZNHIT3": {"drug": "Tideglusib", "confidence": 0.89},
-            "PDGFRL": {"drug": "Crenolanib", "confidence": 0.91},
-            "SIN3A": {"drug": "Vorinostat", "confidence": 0.85},
-            "BMPR1A": {"drug": "LDN-193189", "confidence": 0.93}
-        }
-        return drug_library.get(symbol.upper(), {"drug": None, "confidence": 0.0})
+        return DRUG_LIBRARY.get(symbol.upper(), {"drug": None, "confidence": 0.0})
 
+    @metrics.timed(metrics.ENGINE_SECONDS)
     def get_explanation(self, symbol):
-        match = self.results[self.results['gene_symbol'].str.upper() == symbol.upper()]
-        if match.empty:
+        row = self._lookup_row(symbol)
+        if row is None:
             return {"Interaction Skewness": 0, "Network Centrality": 0, "Functional Connectivity": 0}
-        row = match.iloc[0]
         return {
             "Interaction Skewness": round(row.get('ppi_skew', 0), 4),
             "Network Centrality": int(row.get('degree_max', 0)),
             "Functional Connectivity": round(row.get('ppi_mean', 0), 4)
         }
 
+    def _column(self, frame, name, default=0):
+        return frame[name] if name in frame.columns else pd.Series(default, index=frame.index)
+
+    @metrics.timed(metrics.ENGINE_SECONDS)
+    def _format_positions(self, positions):
+        # One pass over the selected rows: columns are rounded/cast vectorised, then zipped
+        rows = self.results.iloc[list(positions)]
+        if rows.empty:
+            return []
+        symbols = rows['gene_symbol'].tolist()
+        scores = rows['discovery_score'].round(4).tolist()
+        skews = self._column(rows, 'ppi_skew').round(4).tolist()
+        degrees = self._column(rows, 'degree_max').fillna(0).astype(int).tolist()
+        means = self._column(rows, 'ppi_mean').round(4).tolist()
+        is_target = rows['is_target'].tolist()
+        drug_col = 'predicted_drug' if 'predicted_drug' in rows.columns else 'drug_name'
+        predicted = [d if pd.notna(d) else None for d in self._column(rows, drug_col, None).tolist()]
+
+        formatted = []
+        for symbol, score, skew, degree, mean, target, drug in zip(symbols, scores, skews, degrees, means, is_target, predicted):
+            mapped_drugs = self.gene_drug_map.get(symbol.upper(), limit=5)
+            formatted.append({
+                "gene_symbol": symbol,
+                "discovery_score": score,
+                "status": "Novel Discovery" if target == 0 else ("Drug Target" if mapped_drugs else "Disease Gene"),
+                "existing_drugs": ", ".join(mapped_drugs) if mapped_drugs else "No known drugs found",
+                "assistant_advice": "Search this gene directly for AI analysis.",
+                "xai_weights": {
+                    "Interaction Skewness": skew,
+                    "Network Centrality": degree,
+                    "Functional Connectivity": mean
+                },
+                "predicted_drug": {"drug": str(drug), "confidence": 0.92} if drug is not None
+                else DRUG_LIBRARY.get(symbol.upper(), {"drug": None, "confidence": 0.0})
+            })
+        return formatted
+
+    def _positions_for(self, symbols):
+        positions = {self.gene_index.get(str(s).upper()) for s in symbols}
+        positions.discard(None)
+        # Row order of the results file, i.e. highest discovery score first
+        return sorted(positions)
+
+    def format_results(self, symbols):
+        return self._format_positions(self._positions_for(symbols))
+
     def format_result(self, row, include_advice=True):
-        symbol = row['gene_symbol']
-        score = round(row['discovery_score'], 4)
-        xai = self.get_explanation(symbol)
-        prediction = self.predict_dti_affinity(symbol)
-        advice = self.get_groq_advice({"symbol": symbol, "score": score, "xai": xai}) if include_advice else "Search this gene directly for AI analysis."
-        mapped_drugs = self.gene_drug_map.get(symbol.upper(), [])
-        existing_drugs = ", ".join(mapped_drugs[:5]) if mapped_drugs else "No known drugs found"
-        return {
-            "gene_symbol": symbol,
-            "discovery_score": score,
-            "status": "Novel Discovery" if row['is_target'] == 0 else ("Drug Target" if mapped_drugs else "Disease Gene"),
-            "existing_drugs": existing_drugs,
-            "assistant_advice": advice,
-            "xai_weights": xai,
-            "predicted_drug": prediction
-        }
+        result = self.format_results([row['gene_symbol']])[0]
+        if include_advice:
+            result["assistant_advice"] = self.get_groq_advice(self._advice_input(row))
+        return result
 
-    def search_by_gene(self, symbol):
-        match = self.results[self.results['gene_symbol'].str.upper() == symbol.upper()]
-        if match.empty: return {"error": "Gene not found"}
-        return self.format_result(match.iloc[0], include_advice=True)
+    @metrics.timed(metrics.ENGINE_SECONDS)
+    def search_by_gene(self, symbol, defer_advice=False):
+        row = self._lookup_row(symbol)
+        if row is None: return {"error": "Gene not found"}
+        result = self.format_result(row, include_advice=False)
+        result["diseases"] = self.get_gene_diseases(row['gene_symbol'])
+        # Deferred: metrics go out now. Otherwise wait for the LLM summary, but no longer than
+        # the advice request timeout. Either way an unfinished call keeps running in the
+        # background, so the client can poll or stream it.
+        wait = 0.0 if defer_advice else self.advice.request_timeout
+        status, advice = self.advice.poll(self._advice_input(row), wait=wait)
+        if status == "pending" and not defer_advice:
+            advice = CAPACITY_ADVICE
+        result["assistant_advice"] = advice
+        result["advice_status"] = status
+        return result
 
-    def search_by_disease(self, query):
-        matched_disease = next((k for k in self.disease_map.keys() if query.lower() in k.lower()), None)
+    def get_gene_diseases(self, symbol, limit=MAX_GENE_DISEASES):
+        # Orphanet disorders linked to a gene, through the gene -> disease reverse index
+        return self.disease_map.keys_for(symbol, limit=limit)
+
+    @metrics.timed(metrics.ENGINE_SECONDS)
+    def search_by_disease(self, query, limit=None, offset=0):
+        matched_disease = self.disease_index.best(query)
         if not matched_disease: return {"error": "Disease not found"}
-        symbols = self.disease_map[matched_disease]
-        matches = self.results[self.results['gene_symbol'].isin(symbols)]
+        positions = self._positions_for(self.disease_map.get(matched_disease))
+        page = positions[offset:] if limit is None else positions[offset:offset + limit]
         return {
             "disease": matched_disease,
-            "results": [self.format_result(r, include_advice=False) for _, r in matches.iterrows()]
+            "total": len(positions),
+            "offset": offset,
+            "limit": limit,
+            "results": self._format_positions(page)
         }
 
+    @metrics.timed(metrics.ENGINE_SECONDS)
+    def search_by_drug(self, name, limit=None, offset=0):
+        # Scored target genes of a DrugBank drug, through the drug -> gene reverse index
+        code = self.gene_drug_map.value_code(name)
+        if code is None: return {"error": "Drug not found"}
+        positions = self._positions_for(self.gene_drug_map.keys_for(name))
+        page = positions[offset:] if limit is None else positions[offset:offset + limit]
+        return {
+            "drug": self.gene_drug_map.value_table[code],
+            "total": len(positions),
+            "offset": offset,
+            "limit": limit,
+            "results": self._format_positions(page)
+        }
+
+    @metrics.timed(metrics.ENGINE_SECONDS)
+    def get_network(self, symbol, min_score=network_index.DEFAULT_MIN_SCORE, hops=1, limit=50,
+                    rank="combined", only=None):
+        # Interaction partners of a gene from the memory-mapped STRING index, ranked by
+        # combined_score then discovery_score (or the reverse with rank="discovery")
+        if self.network is None: return {"error": "Network index unavailable"}
+        hood = self.network.neighborhood(symbol, min_score=min_score, hops=hops)
+        if hood is None: return {"error": "Gene not found"}
+
+        genes = self.network.genes
+        positions = self.network_rows[hood["genes"]]
+        scored = positions >= 0
+        discovery = np.full(len(positions), -np.inf)
+        targets = np.zeros(len(positions), dtype=bool)
+        if scored.any():
+            discovery[scored] = self.results['discovery_score'].to_numpy(dtype=float)[positions[scored]]
+            targets[scored] = self._column(self.results, 'is_target').to_numpy()[positions[scored]] == 1
+        drugs = self.network_drugs[hood["genes"]]
+
+        keep = np.ones(len(positions), dtype=bool)
+        if only == "disease":
+            keep = targets
+        elif only == "drug":
+            keep = drugs > 0
+        candidates = np.flatnonzero(keep)
+        # lexsort orders by its last key first; -inf puts unscored genes last
+        keys = (-discovery[candidates], -hood["scores"][candidates])
+        order = candidates[np.lexsort(keys if rank == "combined" else keys[::-1])][:limit]
+
+        neighbors = []
+        for i in order.tolist():
+            neighbors.append({
+                "gene_symbol": str(genes[hood["genes"][i]]),
+                "combined_score": int(hood["scores"][i]),
+                "hops": int(hood["hops"][i]),
+                "via": str(genes[hood["via"][i]]) if hood["via"][i] >= 0 else None,
+                "discovery_score": round(float(discovery[i]), 4) if scored[i] else None,
+                "status": ("Not Scored" if not scored[i] else "Novel Discovery" if not targets[i]
+                           else ("Drug Target" if drugs[i] else "Disease Gene")),
+                "known_drugs": int(drugs[i]),
+            })
+        return {
+            "gene": str(genes[hood["code"]]),
+            "min_score": min_score,
+            "hops": hops,
+            "rank": rank,
+            "total": len(candidates),
+            "neighbors": neighbors,
+        }
+
+    @metrics.timed(metrics.ENGINE_SECONDS)
     def get_top_10_genes(self):
-        return [self.format_result(r, include_advice=False) for _, r in self.results.head(10).iterrows()]
+        return self._format_positions(range(min(10, len(self.results))))
+
+
+def source_fingerprints():
+    # Stat-only (size, mtime) fingerprints of every data file, grouped by DATA_SOURCES part
+    return {part: [cache_store.file_fingerprint(p, with_hash=False) for p in paths]
+            for part, paths in DATA_SOURCES.items()}
+
+
+def data_version(fingerprints):
+    # Cheap stat-based version of the files the engine was loaded from; response caches key on it
+    version = hashlib.sha1(json.dumps(fingerprints, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    newest = max((fp["mtime"] for fp in fingerprints if "mtime" in fp), default=0)
+    return version, datetime.fromtimestamp(newest / 1e9, tz=timezone.utc)
+
+
+def load_reference_maps(rebuild=False, workers=None):
+    # Compact CSR maps, memory-mapped from the cache (see compact_maps). When new XML lands,
+    # the first gunicorn worker to get here parses it; the others wait on the lock and
+    # then map the finished cache.
+    with cache_store.build_lock("reference_maps"):
+        disease_map = None if rebuild else compact_maps.load_saved(DISEASE_MAP_STORE, ORPHANET_FILES)
+        gene_drug_map = None if rebuild else compact_maps.load_saved(GENE_DRUG_MAP_STORE, [DRUGBANK_FILE])
+        if disease_map is not None and gene_drug_map is not None:
+            print("⚡ Memory-mapped disease and gene-drug maps from cache")
+            return disease_map, gene_drug_map
+
+        # Both maps come from the shared parsed corpus, which main.py reuses for training
+        corpus = ingestion.load_corpus(ORPHANET_FILES, DRUGBANK_FILE, rebuild=rebuild, workers=workers)
+        if disease_map is None:
+            disease_map = compact_maps.save_and_reopen(
+                DISEASE_MAP_STORE, DiscoveryEngine._build_disease_mapping(corpus), ORPHANET_FILES)
+        if gene_drug_map is None:
+            print("🔬 Building gene-drug map from DrugBank corpus...")
+            gene_drug_map = compact_maps.save_and_reopen(
+                GENE_DRUG_MAP_STORE, DiscoveryEngine._build_gene_drug_mapping(corpus), [DRUGBANK_FILE])
+        return disease_map, gene_drug_map
+
+
+def load_network(rebuild=False):
+    # Missing or LFS-pointer STRING files leave /api/network unavailable instead of failing startup
+    try:
+        return network_index.load_index(*PPI_FILES, rebuild=rebuild)
+    except Exception as e:
+        print(f"⚠️ Network index unavailable: {e}")
+        return None
+
+
+def prebuild_caches(rebuild=False):
+    load_reference_maps(rebuild=rebuild)
+    load_network(rebuild=rebuild)
+    try:
+        compact_models.load_models(MOD_DIR, rebuild=rebuild)
+    except Exception as e:
+        print(f"⚠️ Compact model export skipped: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Discovery engine maintenance commands")
+    parser.add_argument("--build-cache", action="store_true", help="prebuild the Orphanet/DrugBank map, network index and compact model caches")
+    parser.add_argument("--force", action="store_true", help="rebuild caches even if they are up to date")
+    parser.add_argument("--prewarm-advice", type=int, metavar="N", help="generate and cache AI advice for the top N genes")
+    args = parser.parse_args()
+    if args.build_cache:
+        prebuild_caches(rebuild=args.force)
+    if args.prewarm_advice:
+        advice = DiscoveryEngine().prewarm_advice(args.prewarm_advice)
+        print(f"✅ Prewarmed advice for {len(advice)} genes")
+    if not (args.build_cache or args.prewarm_advice):
+        parser.print_help()
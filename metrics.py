@@ -0,0 +1,256 @@
+import functools
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter as Tally
+from pathlib import Path
+
+# Prometheus text exposition (format 0.0.4) without a client library. Metrics live in
+# the process that records them: under gunicorn every worker keeps its own registry,
+# like the /api/score/stats batch history, and discovery_process_info names its pid.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+# Sampling profiler: off unless PROFILE_TOKEN is set and a request sends it in PROFILE_HEADER
+PROFILE_HEADER = "X-Profile"
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+PROFILE_KEEP = 50
+PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def snapshot(self):
+        # {label values: current value}; histograms give [bucket counts, count, sum]
+        with self._lock:
+            return {key: value if not isinstance(value, list) else [list(value[0]), value[1], value[2]]
+                    for key, value in self._values.items()}
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            samples = list(self._samples())
+        lines.extend(f"{name}{labels} {_number(value)}" for name, labels, value in samples)
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}_total", _format_labels(self.labels, key), value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def time(self, **labels):
+        return _Timer(lambda seconds: self.set(round(seconds, 6), **labels))
+
+    def _samples(self):
+        for key, value in sorted(self._values.items()):
+            yield self.name, _format_labels(self.labels, key), value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            state[1] += 1
+            state[2] += value
+
+    def time(self, **labels):
+        return _Timer(lambda seconds: self.observe(seconds, **labels))
+
+    def _samples(self):
+        for key, (counts, count, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                yield f"{self.name}_bucket", _format_labels(self.labels, key, [("le", _number(float(bound)))]), cumulative
+            yield f"{self.name}_bucket", _format_labels(self.labels, key, [("le", "+Inf")]), count
+            yield f"{self.name}_count", _format_labels(self.labels, key), count
+            yield f"{self.name}_sum", _format_labels(self.labels, key), total
+
+
+class _Timer:
+    def __init__(self, record):
+        self.record = record
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.record(time.perf_counter() - self.start)
+        return False
+
+
+def timed(histogram):
+    # Records the wrapped function's latency under method=<function name>, including failures
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, method=func.__name__)
+        return wrapper
+    return decorate
+
+
+def render():
+    pid = os.getpid()
+    lines = [
+        "# HELP discovery_process_info Process that produced these metrics",
+        "# TYPE discovery_process_info gauge",
+        f'discovery_process_info{{pid="{pid}"}} 1',
+    ]
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+ENGINE_SECONDS = Histogram("discovery_engine_seconds", "DiscoveryEngine method latency", ["method"])
+HTTP_SECONDS = Histogram("discovery_http_request_seconds", "Flask request latency up to the response headers",
+                         ["route", "method", "status"])
+JSON_SECONDS = Histogram("discovery_json_serialize_seconds", "Time spent serialising JSON response bodies")
+JSON_BYTES = Counter("discovery_json_serialized_bytes", "Bytes of JSON produced by the app's JSON provider")
+LLM_SECONDS = Histogram("discovery_llm_request_seconds", "Latency of each Groq chat completion attempt",
+                        ["outcome"], buckets=LLM_BUCKETS)
+ADVICE_CACHE = Counter("discovery_advice_cache_lookups", "Advice cache lookups by result", ["result"])
+STARTUP_SECONDS = Gauge("discovery_startup_phase_seconds", "Duration of each engine startup phase", ["phase"])
+RELOAD_SECONDS = Gauge("discovery_reload_phase_seconds", "Duration of each phase of the last data hot reload",
+                       ["phase"])
+DATA_RELOADS = Counter("discovery_data_reloads", "Data hot reloads by result", ["result"])
+PROFILES = Counter("discovery_profiles", "Requests profiled through the sampling profiler hook")
+
+
+# Samples one thread's Python stack every `interval` seconds from a helper thread and
+# tallies the stacks in the "collapsed" format read by flamegraph.pl and speedscope
+class SamplingProfiler:
+    def __init__(self, thread_id=None, interval=PROFILE_INTERVAL_MS / 1000.0):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Tally()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, name="request-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self.seconds = time.perf_counter() - self.started
+        return self
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def profile_requested(headers):
+    token = os.getenv("PROFILE_TOKEN")
+    return bool(token) and headers.get(PROFILE_HEADER) == token
+
+
+def save_profile(profiler, directory, label):
+    # Written to disk so a follow-up request can fetch it from any worker on the host
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    profile_id = uuid.uuid4().hex
+    header = f"# {label} samples={profiler.samples} seconds={profiler.seconds:.4f} interval_ms={profiler.interval * 1000:g}\n"
+    (directory / f"{profile_id}.txt").write_text(header + profiler.collapsed(), encoding="utf-8")
+    old = sorted(directory.glob("*.txt"), key=lambda p: p.stat().st_mtime, reverse=True)[PROFILE_KEEP:]
+    for path in old:
+        path.unlink(missing_ok=True)
+    PROFILES.inc()
+    return profile_id
+
+
+def load_profile(directory, profile_id):
+    if not PROFILE_ID.match(profile_id or ""):
+        return None
+    path = Path(directory) / f"{profile_id}.txt"
+    return path.read_text(encoding="utf-8") if path.exists() else None
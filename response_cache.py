@@ -0,0 +1,42 @@
+import hashlib
+import threading
+
+from flask import Response, current_app, request
+
+
+class ResponseCache:
+    # Serialized JSON bodies for read-mostly endpoints. An entry is rebuilt only when
+    # the engine's data version moves, and is served with ETag/Last-Modified so
+    # clients revalidate with a 304 instead of downloading the body again.
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def entry(self, name, version, builder):
+        entry = self._entries.get(name)
+        if entry is not None and entry["version"] == version:
+            return entry
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry["version"] != version:
+                body = current_app.json.dumps(builder()).encode("utf-8")
+                entry = {
+                    "version": version,
+                    "body": body,
+                    "etag": hashlib.sha1(body).hexdigest()[:20],
+                }
+                self._entries[name] = entry
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def respond(self, name, version, last_modified, builder):
+        entry = self.entry(name, version, builder)
+        response = Response(entry["body"], mimetype="application/json")
+        response.set_etag(entry["etag"])
+        response.last_modified = last_modified
+        # Cacheable, but always revalidated so a data release shows up immediately
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
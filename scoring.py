@@ -0,0 +1,226 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+import compact_models
+from data_processing import MODEL_FEATURES, features_from_edges
+
+MAX_SCORE = 1000  # STRING combined_score range is 0-1000
+
+
+class ScoringError(ValueError):
+    pass
+
+
+def feature_matrix(items):
+    # Each item carries either precomputed "features" or raw "edges" ([partner, score] pairs)
+    try:
+        return _feature_matrix(items)
+    except ScoringError:
+        raise
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError) as e:
+        raise ScoringError(f"invalid scoring input: {e}")
+
+
+def _feature_matrix(items):
+    symbols, rows, edge_items, edge_scores = [], [], [], []
+    for i, item in enumerate(items):
+        symbol = str(item.get("gene_symbol") or f"item_{i}")
+        symbols.append(symbol)
+        if "features" in item:
+            features = item["features"]
+            if isinstance(features, dict):
+                missing = [name for name in MODEL_FEATURES if name not in features]
+                if missing:
+                    raise ScoringError(f"{symbol}: missing features {', '.join(missing)}")
+                features = [features[name] for name in MODEL_FEATURES]
+            if len(features) != len(MODEL_FEATURES):
+                raise ScoringError(f"{symbol}: expected {len(MODEL_FEATURES)} features")
+            rows.append(features)
+        elif item.get("edges"):
+            rows.append(None)
+            for edge in item["edges"]:
+                # Edges group by item position, so repeated symbols are scored separately
+                edge_items.append(i)
+                edge_scores.append(edge["score"] if isinstance(edge, dict) else edge[-1])
+        else:
+            raise ScoringError(f"{symbol}: provide 'features' or a non-empty 'edges' list")
+
+    X = np.zeros((len(items), len(MODEL_FEATURES)), dtype=np.float64)
+    fixed = [i for i, row in enumerate(rows) if row is not None]
+    if fixed:
+        X[fixed] = np.asarray([rows[i] for i in fixed], dtype=np.float64)
+    if edge_scores:
+        scores = np.asarray(edge_scores, dtype=np.float64)
+        if not ((scores >= 0) & (scores <= MAX_SCORE)).all():
+            raise ScoringError(f"edge scores must be between 0 and {MAX_SCORE}")
+        derived = features_from_edges(edge_items, np.rint(scores))
+        X[derived['gene_symbol'].to_numpy(dtype=np.int64)] = derived[MODEL_FEATURES].to_numpy(dtype=np.float64)
+    if not np.isfinite(X).all():
+        raise ScoringError("feature values must be finite")
+    return symbols, X
+
+
+class MicroBatcher:
+    # Coalesces concurrent scoring requests into one vectorised predict call.
+    # A batch closes when it reaches max_rows or max_wait_ms after its first request.
+    # The thread exits after idle_seconds without requests; the next submit starts another.
+    def __init__(self, predict, max_rows=None, max_wait_ms=None, history=256, idle_seconds=60):
+        self.predict = predict
+        self.max_rows = max_rows or int(os.getenv("SCORE_BATCH_MAX_ROWS", 4096))
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else float(os.getenv("SCORE_BATCH_WAIT_MS", 5))) / 1000
+        self.idle_seconds = idle_seconds
+        self.batches = deque(maxlen=history)
+        self._queue = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        # Called with self._lock held. Threads do not survive fork, so each worker process
+        # starts its own batcher.
+        if self._queue is None or self._pid != os.getpid():
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, args=(self._queue,), name="score-batcher", daemon=True).start()
+        return self._queue
+
+    def submit(self, X):
+        future = Future()
+        # Put under the lock, so an idle thread that detaches its queue cannot strand a request
+        with self._lock:
+            self._ensure_worker().put((X, future, time.perf_counter()))
+        return future
+
+    def _collect(self, pending):
+        while True:
+            try:
+                batch = [pending.get(timeout=self.idle_seconds)]
+                break
+            except queue.Empty:
+                # Idle: end the thread, so a service dropped by a hot reload frees its models
+                with self._lock:
+                    if pending.empty():
+                        if self._queue is pending:
+                            self._queue = None
+                        return None
+        rows = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_rows:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = pending.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _run(self, pending):
+        while True:
+            batch = self._collect(pending)
+            if batch is None:
+                return
+            start = time.perf_counter()
+            try:
+                probs = self.predict(np.vstack([X for X, _, _ in batch]))
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            done = time.perf_counter()
+            stats = {
+                "requests": len(batch),
+                "rows": int(len(probs)),
+                "predict_ms": round((done - start) * 1000, 3),
+                "max_queue_ms": round((start - min(t for _, _, t in batch)) * 1000, 3),
+            }
+            self.batches.append(stats)
+            offset = 0
+            for X, future, _ in batch:
+                future.set_result((probs[offset:offset + len(X)], stats))
+                offset += len(X)
+
+    def summary(self):
+        batches = list(self.batches)
+        if not batches:
+            return {"batches": 0}
+        predict_ms = np.array([b["predict_ms"] for b in batches])
+        return {
+            "batches": len(batches),
+            "mean_rows": round(float(np.mean([b["rows"] for b in batches])), 2),
+            "mean_requests": round(float(np.mean([b["requests"] for b in batches])), 2),
+            "predict_ms_p50": round(float(np.percentile(predict_ms, 50)), 3),
+            "predict_ms_p99": round(float(np.percentile(predict_ms, 99)), 3),
+        }
+
+
+class ScoringService:
+    # Serves the scaler -> MLP -> RF ensemble from its memory-mapped compact export
+    def __init__(self, model_dir, batcher=None, cache_dir=None):
+        self.model_dir = model_dir
+        self.cache_dir = cache_dir
+        self._model = None
+        self._error = None
+        self.load_seconds = None
+        self._load_lock = threading.Lock()
+        self.batcher = batcher or MicroBatcher(self._predict)
+
+    @property
+    def model(self):
+        # Models load on the first scoring request unless preload() ran at startup
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    try:
+                        model = compact_models.load_models(self.model_dir, self.cache_dir)
+                        if model is None:
+                            raise RuntimeError("compact model export failed")
+                    except Exception as e:
+                        self._error = str(e)
+                        raise
+                    self._model, self._error = model, None
+                    self.load_seconds = round(time.perf_counter() - start, 3)
+        return self._model
+
+    def preload(self, background=False):
+        def _load():
+            try:
+                self.model
+            except Exception as e:
+                print(f"⚠️ Model preload failed: {e}")
+        if not background:
+            return _load()
+        threading.Thread(target=_load, name="model-loader", daemon=True).start()
+
+    def _predict(self, X):
+        return self.model.predict_proba(X)
+
+    def score(self, items, timeout=30.0):
+        symbols, X = feature_matrix(items)
+        probs, batch = self.batcher.submit(X).result(timeout=timeout)
+        threshold = self.model.threshold
+        return {
+            "threshold": round(threshold, 4),
+            "results": [
+                {
+                    "gene_symbol": symbol,
+                    "discovery_score": round(float(prob), 4),
+                    "is_candidate": bool(prob >= threshold),
+                    "features": dict(zip(MODEL_FEATURES, row)),
+                }
+                for symbol, prob, row in zip(symbols, probs, np.round(X, 4).tolist())
+            ],
+            "batch": batch,
+        }
+
+    def status(self):
+        return {"model_loaded": self._model is not None, "load_seconds": self.load_seconds,
+                "error": self._error, **self.batcher.summary()}
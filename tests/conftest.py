@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+# The serving modules sit at the repository root and the training package uses flat
+# imports (`import utils`), as in inference_engine.py
+sys.path[:0] = [str(ROOT), str(ROOT / "RareDiseaseProject")]
@@ -0,0 +1,62 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from advice_service import AdviceService, StubClient
+
+
+def gene(symbol, score=0.9):
+    return {"symbol": symbol, "score": score, "xai": {"Network Centrality": 3, "Interaction Skewness": 0.1}}
+
+
+@pytest.fixture
+def stub():
+    return StubClient(latency=0.2, fail_first=0)
+
+
+@pytest.fixture
+def service(tmp_path, stub):
+    return AdviceService(tmp_path / "advice.sqlite3", client=stub, rate_per_sec=100,
+                         backoff_base=0.01, backoff_cap=0.05, request_timeout=5)
+
+
+def wait_for_released(service, timeout=1.0):
+    # Done-callbacks run just after result() wakes its waiters
+    deadline = time.perf_counter() + timeout
+    while service._pending and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    return not service._pending
+
+
+def test_concurrent_polls_share_one_call(service, stub):
+    with ThreadPoolExecutor(8) as pool:
+        answers = list(pool.map(lambda _: service.poll(gene("COAL1"), wait=5), range(8)))
+    assert stub.calls == 1
+    assert {status for status, _ in answers} == {"ready"}
+    assert len({advice for _, advice in answers}) == 1
+
+
+def test_pending_then_ready_from_cache(service, stub):
+    assert service.poll(gene("LATE1")) == ("pending", None)
+    # A second poll while the call runs joins it instead of starting another
+    assert service.poll(gene("LATE1")) == ("pending", None)
+    status, advice = service.poll(gene("LATE1"), wait=5)
+    assert status == "ready" and advice == "Stub advice #1"
+    assert wait_for_released(service)
+    assert service.poll(gene("LATE1")) == ("ready", advice)
+    assert stub.calls == 1
+
+
+def test_different_metrics_are_separate_calls(service, stub):
+    first = service.poll(gene("SCORE1", 0.9), wait=5)
+    second = service.poll(gene("SCORE1", 0.5), wait=5)
+    assert stub.calls == 2 and first != second
+
+
+def test_unpolled_entries_are_released(service, stub):
+    for symbol in ("DROP1", "DROP2", "DROP3"):
+        service.poll(gene(symbol))
+    assert len(service._pending) == 3
+    assert wait_for_released(service, timeout=5)
+    assert stub.calls == 3
@@ -0,0 +1,64 @@
+import json
+import os
+
+import pytest
+
+import cache_store
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.xml"
+    path.write_text("<data>v1</data>")
+    return path
+
+
+def test_round_trip(source, tmp_path):
+    cache_store.save("entry", [source], {"a": [1, 2]}, tmp_path / "cache")
+    assert cache_store.load("entry", [source], tmp_path / "cache") == {"a": [1, 2]}
+
+
+def test_changed_content_invalidates(source, tmp_path):
+    cache_store.save("entry", [source], "payload", tmp_path / "cache")
+    source.write_text("<data>v22</data>")
+    assert cache_store.load("entry", [source], tmp_path / "cache") is None
+
+
+def test_same_size_edit_invalidates(source, tmp_path):
+    cache_store.save("entry", [source], "payload", tmp_path / "cache")
+    st = source.stat()
+    source.write_text("<data>v2</data>")
+    os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert cache_store.load("entry", [source], tmp_path / "cache") is None
+
+
+def test_touch_without_change_stays_valid(source, tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_store.save("entry", [source], "payload", cache_dir)
+    st = source.stat()
+    os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert cache_store.load("entry", [source], cache_dir) == "payload"
+    # The new mtime is recorded, so the next check does not hash the file again
+    meta = json.loads((cache_dir / "entry.meta.json").read_text())
+    assert cache_store._sources_match(meta["sources"], [source]) == (True, False)
+
+
+def test_missing_source_appearing_invalidates(tmp_path):
+    path = tmp_path / "later.txt"
+    cache_store.save("entry", [path], "payload", tmp_path / "cache")
+    assert cache_store.load("entry", [path], tmp_path / "cache") == "payload"
+    path.write_text("now here")
+    assert cache_store.load("entry", [path], tmp_path / "cache") is None
+
+
+def test_version_bump_invalidates(source, tmp_path, monkeypatch):
+    cache_store.save("entry", [source], "payload", tmp_path / "cache")
+    monkeypatch.setattr(cache_store, "CACHE_VERSION", cache_store.CACHE_VERSION + 1)
+    assert cache_store.load("entry", [source], tmp_path / "cache") is None
+
+
+def test_invalidate_and_meta_is_current(source, tmp_path):
+    cache_store.write_meta("arrays", [source], tmp_path / "cache")
+    assert cache_store.meta_is_current("arrays", [source], tmp_path / "cache")
+    cache_store.invalidate("arrays", tmp_path / "cache")
+    assert not cache_store.meta_is_current("arrays", [source], tmp_path / "cache")
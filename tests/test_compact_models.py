@@ -0,0 +1,75 @@
+import warnings
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.neural_network import MLPClassifier
+from sklearn.preprocessing import RobustScaler
+
+import compact_models
+from compact_models import CompactEnsemble, PickledEnsemble
+
+
+@pytest.fixture(scope="module")
+def models():
+    # The training ensemble's shape (RobustScaler -> relu MLP -> RF on the MLP probability), scaled down
+    rng = np.random.default_rng(0)
+    X = rng.gamma(2.0, 200.0, size=(400, 7))
+    y = (X[:, 0] + rng.normal(0, 150, len(X)) > 400).astype(int)
+    scaler = RobustScaler().fit(X)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", ConvergenceWarning)
+        mlp = MLPClassifier(hidden_layer_sizes=(16, 8), activation='relu', max_iter=200,
+                            random_state=0).fit(scaler.transform(X), y)
+    mlp_probs = mlp.predict_proba(scaler.transform(X))[:, 1].reshape(-1, 1)
+    rf = RandomForestClassifier(n_estimators=25, max_depth=6, random_state=0).fit(mlp_probs, y)
+    return scaler, mlp, rf, 0.45
+
+
+@pytest.fixture
+def model_dir(tmp_path, models):
+    for model, name in zip(models, compact_models.MODEL_FILES):
+        joblib.dump(model, tmp_path / name)
+    return tmp_path
+
+
+def test_compact_matches_sklearn(models):
+    arrays, spec = compact_models.export_arrays(*models)
+    compact = CompactEnsemble(arrays, spec)
+    rng = np.random.default_rng(1)
+    X = np.vstack([compact_models.probe_rows(arrays, rows=1000, seed=5), rng.gamma(2.0, 200.0, size=(1000, 7))])
+    check = compact_models.compare(models, compact, X)
+    assert check["prediction_mismatches"] == 0
+    assert check["max_abs_diff"] <= compact_models.PROBE_TOLERANCE
+    np.testing.assert_array_equal(compact.predict(X), PickledEnsemble(models).predict(X))
+
+
+def test_export_round_trip_is_memory_mapped(model_dir, models):
+    cache_dir = model_dir / "cache"
+    spec = compact_models.export_models(model_dir, cache_dir, models)
+    assert spec["export_check"]["prediction_mismatches"] == 0
+    loaded = compact_models.load_models(model_dir, cache_dir)
+    assert isinstance(loaded, CompactEnsemble)
+    assert all(isinstance(array, np.memmap) for array in loaded.arrays.values())
+    X = compact_models.probe_rows(loaded.arrays, rows=200, seed=9)
+    np.testing.assert_allclose(loaded.predict_proba(X), PickledEnsemble(models).predict_proba(X), atol=1e-12)
+
+
+def test_changed_pickles_are_re_exported(model_dir, models):
+    cache_dir = model_dir / "cache"
+    compact_models.export_models(model_dir, cache_dir, models)
+    joblib.dump(0.6, model_dir / "hyper_threshold.pkl")
+    assert compact_models.load_compact(compact_models.model_sources(model_dir), cache_dir) is None
+    assert compact_models.load_models(model_dir, cache_dir).threshold == 0.6
+
+
+def test_refused_export_falls_back_to_pickles(model_dir, models, monkeypatch):
+    cache_dir = model_dir / "cache"
+    monkeypatch.setattr(compact_models, "PROBE_TOLERANCE", -1.0)
+    assert compact_models.export_models(model_dir, cache_dir, models) is None
+    assert compact_models.load_compact(compact_models.model_sources(model_dir), cache_dir) is None
+    loaded = compact_models.load_models(model_dir, cache_dir)
+    assert isinstance(loaded, PickledEnsemble)
+    assert loaded.threshold == models[3]
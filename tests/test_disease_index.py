@@ -0,0 +1,47 @@
+import random
+
+from disease_index import DiseaseIndex
+
+NAMES = ["Marfan syndrome", "marfanoid habitus", "Neonatal Marfan syndrome", "Loeys-Dietz syndrome",
+         "Ehlers-Danlos syndrome", "Marfan", "Alport syndrome", "Fabry disease", "Gaucher disease type 1"]
+
+
+def reference(names, query, limit):
+    # Linear scan with the index's ranking: exact > prefix > substring, then A-Z
+    query = query.strip().lower()
+    ranked = []
+    for name in names:
+        key = name.lower()
+        if query in key:
+            tier = 0 if key == query else 1 if key.startswith(query) else 2
+            ranked.append((tier, key, name))
+    return [name for _, _, name in sorted(ranked)][:limit]
+
+
+def test_exact_then_prefix_then_substring():
+    index = DiseaseIndex(NAMES)
+    assert index.suggest("marfan") == ["Marfan", "Marfan syndrome", "marfanoid habitus", "Neonatal Marfan syndrome"]
+    assert index.best("MARFAN SYNDROME") == "Marfan syndrome"
+    assert index.suggest("disease", limit=2) == ["Fabry disease", "Gaucher disease type 1"]
+
+
+def test_empty_and_missing_queries():
+    index = DiseaseIndex(NAMES)
+    assert index.suggest("", limit=3) == sorted(NAMES, key=lambda n: (n.lower(), n))[:3]
+    assert index.suggest("zzz") == []
+    assert index.suggest("marfan", limit=0) == []
+    assert index.best("zzz") is None
+
+
+def test_matches_linear_scan():
+    rng = random.Random(11)
+    alphabet = "abcde -"
+    names = sorted({"".join(rng.choice(alphabet) for _ in range(rng.randint(1, 12))).strip() or "a"
+                    for _ in range(400)})
+    names = [name.title() if i % 3 == 0 else name for i, name in enumerate(names)]
+    index = DiseaseIndex(names)
+    queries = [name.lower()[i:i + n] for name in names[:80] for i, n in ((0, 2), (1, 3), (2, 5))]
+    queries += ["".join(rng.choice(alphabet) for _ in range(n)) for n in (1, 2, 3, 4, 6) for _ in range(20)]
+    for query in queries:
+        for limit in (1, 5, 50):
+            assert index.suggest(query, limit) == reference(names, query, limit), (query, limit)
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from data_processing import _accumulate_moments, _finalize_moments, _new_moment_accumulator
+
+
+def _reference(codes, scores, symbols):
+    frame = pd.DataFrame({"gene_symbol": np.asarray(symbols, dtype=object)[codes], "score": scores})
+    grouped = frame.groupby("gene_symbol", sort=False)["score"]
+    return pd.DataFrame({
+        "ppi_mean": grouped.mean(),
+        "ppi_max": grouped.max(),
+        "ppi_std": grouped.std(),
+        "ppi_skew": grouped.skew(),
+        "interaction_count": grouped.size(),
+    })
+
+
+def _moments(codes, scores, n_genes, chunks=1):
+    acc = _new_moment_accumulator(n_genes)
+    for part_codes, part_scores in zip(np.array_split(codes, chunks), np.array_split(scores, chunks)):
+        _accumulate_moments(acc, part_codes, part_scores)
+    return acc
+
+
+def test_matches_pandas_groupby():
+    rng = np.random.default_rng(7)
+    n_genes = 60
+    symbols = [f"G{i}" for i in range(n_genes)]
+    # Heavy-tailed group sizes, plus single-edge, two-edge and constant-score groups;
+    # gene 59 has no edges and must not appear
+    weights = 1.0 / np.arange(1, n_genes - 3)
+    codes = rng.choice(n_genes - 4, size=5000, p=weights / weights.sum())
+    scores = rng.integers(150, 1000, size=len(codes))
+    codes = np.concatenate([codes, [56, 57, 57, 58, 58, 58]])
+    scores = np.concatenate([scores, [400, 300, 900, 700, 700, 700]])
+
+    got = _finalize_moments(_moments(codes, scores, n_genes, chunks=3), symbols).set_index("gene_symbol")
+    expected = _reference(codes, scores, symbols)
+
+    assert "G59" not in got.index
+    got = got.loc[expected.index]
+    for column in expected.columns:
+        np.testing.assert_allclose(got[column].to_numpy(dtype=np.float64),
+                                   expected[column].to_numpy(dtype=np.float64),
+                                   rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=column)
+    assert got.loc["G58", "ppi_skew"] == 0.0
+    assert np.isnan(got.loc["G56", "ppi_std"]) and np.isnan(got.loc["G57", "ppi_skew"])
+
+
+def test_chunking_does_not_change_results():
+    rng = np.random.default_rng(3)
+    codes = rng.integers(0, 20, size=3000)
+    scores = rng.integers(0, 1000, size=3000)
+    symbols = [f"G{i}" for i in range(20)]
+    whole = _finalize_moments(_moments(codes, scores, 20), symbols)
+    chunked = _finalize_moments(_moments(codes, scores, 20, chunks=7), symbols)
+    pd.testing.assert_frame_equal(whole, chunked)
@@ -0,0 +1,92 @@
+import pytest
+
+from pipeline import Stage, run_pipeline, stage_key
+
+BASE = {"version": 1, "params": {"alpha": 0.001}, "sources": ["aa"], "deps": ["d1"]}
+CHANGED = {"version": 2, "params": {"alpha": 0.01}, "sources": ["bb"], "deps": ["d2"]}
+
+
+def noop(inputs, out_dir, params, rebuild):
+    return None
+
+
+def key_of(spec):
+    return stage_key(Stage("s", noop, params=spec["params"], version=spec["version"]), spec["sources"], spec["deps"])
+
+
+def test_stage_key_is_stable():
+    # Keys name cache directories across runs and machines, so they must not depend on
+    # dict order or hash randomisation; a change to this value orphans every cached stage
+    params = {"rf": {"n_estimators": 300, "max_depth": 8}}
+    stage = Stage("models", noop, deps=["features"], params=params, version=2)
+    key = stage_key(stage, ["ab" * 32], ["0123456789abcdef"])
+    assert key == "46b9ceba97173ec3"
+    reordered = Stage("models", noop, deps=["features"], params={"rf": {"max_depth": 8, "n_estimators": 300}},
+                      version=2)
+    assert stage_key(reordered, ["ab" * 32], ["0123456789abcdef"]) == key
+
+
+@pytest.mark.parametrize("field", sorted(BASE))
+def test_stage_key_changes_with_each_input(field):
+    assert key_of(BASE) != key_of({**BASE, field: CHANGED[field]})
+
+
+@pytest.fixture
+def counted(tmp_path):
+    # source -> "parse" (the file's line count) -> "double"; runs records every call
+    source = tmp_path / "source.txt"
+    source.write_text("a\nb\n")
+    runs = []
+
+    def parse(inputs, out_dir, params, rebuild):
+        runs.append("parse")
+        return len(source.read_text().splitlines())
+
+    def double(inputs, out_dir, params, rebuild):
+        runs.append("double")
+        return inputs["parse"] * 2
+
+    def run(**kwargs):
+        stages = [Stage("parse", parse, sources=[source]), Stage("double", double, deps=["parse"])]
+        return run_pipeline(stages, cache_dir=tmp_path / "cache", **kwargs)
+
+    return source, runs, run
+
+
+def test_second_run_is_cached(counted):
+    _, runs, run = counted
+    assert run()["double"] == 4
+    runs.clear()
+    assert run()["double"] == 4
+    assert runs == []
+
+
+def test_source_change_reruns_downstream(counted):
+    source, runs, run = counted
+    run()
+    runs.clear()
+    source.write_text("a\nb\nc\n")
+    assert run()["double"] == 6
+    assert runs == ["parse", "double"]
+
+
+def test_identical_output_keeps_downstream_cached(counted):
+    source, runs, run = counted
+    run()
+    runs.clear()
+    source.write_text("x\ny\n")
+    assert run()["double"] == 4
+    assert runs == ["parse"]
+
+
+def test_from_stage_and_force(counted):
+    _, runs, run = counted
+    run()
+    runs.clear()
+    run(from_stage="double")
+    assert runs == ["double"]
+    runs.clear()
+    run(force=True)
+    assert runs == ["parse", "double"]
+    with pytest.raises(ValueError):
+        run(from_stage="missing")
@@ -0,0 +1,67 @@
+from datetime import datetime, timezone
+
+import pytest
+from flask import Flask
+
+from response_cache import ResponseCache
+
+MODIFIED = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def served():
+    # A one-route app whose payload and data version the test can change
+    app = Flask(__name__)
+    cache = ResponseCache()
+    state = {"version": "v1", "payload": {"genes": ["ZNHIT3"]}, "builds": 0}
+
+    def build():
+        state["builds"] += 1
+        return state["payload"]
+
+    @app.route("/genes")
+    def genes():
+        return cache.respond("genes", state["version"], MODIFIED, build)
+
+    return app.test_client(), state
+
+
+def test_first_response_carries_validators(served):
+    client, state = served
+    response = client.get("/genes")
+    assert response.status_code == 200
+    assert response.get_json() == {"genes": ["ZNHIT3"]}
+    assert response.headers["ETag"] and response.last_modified == MODIFIED
+    assert "no-cache" in response.headers["Cache-Control"]
+
+
+def test_matching_etag_gets_304(served):
+    client, state = served
+    etag = client.get("/genes").headers["ETag"]
+    response = client.get("/genes", headers={"If-None-Match": etag})
+    assert response.status_code == 304 and response.data == b""
+    assert state["builds"] == 1
+
+
+def test_if_modified_since_gets_304(served):
+    client, _ = served
+    response = client.get("/genes", headers={"If-Modified-Since": "Wed, 01 May 2024 12:00:00 GMT"})
+    assert response.status_code == 304
+
+
+def test_new_version_rebuilds_and_changes_etag(served):
+    client, state = served
+    etag = client.get("/genes").headers["ETag"]
+    state.update(version="v2", payload={"genes": ["SIN3A"]})
+    response = client.get("/genes", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json() == {"genes": ["SIN3A"]}
+    assert response.headers["ETag"] != etag
+    assert state["builds"] == 2
+
+
+def test_same_version_is_built_once(served):
+    client, state = served
+    for _ in range(3):
+        client.get("/genes")
+    assert state["builds"] == 1